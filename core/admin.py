@@ -0,0 +1,18 @@
+from django.contrib import admin
+
+from . import models
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "name",
+        "status",
+        "attempts",
+        "run_after",
+        "created",
+    ]
+    list_filter = ["status", "name"]
+
+
+admin.site.register(models.Job, JobAdmin)
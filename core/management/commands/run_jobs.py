@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from core.utils import jobs
+
+
+class Command(BaseCommand):
+    help = "Run the queued background jobs, eg permissions and notifications of new submissions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit once there are no due jobs")
+        parser.add_argument("--batch", type=int, default=100, help="Jobs claimed at a time")
+        parser.add_argument("--sleep", type=float, default=1, help="Seconds to wait when the queue is empty")
+        parser.add_argument("--stats", action="store_true", help="Print the backlog and exit")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            for key, value in jobs.backlog_stats().items():
+                self.stdout.write(f"{key}: {value}")
+            return
+
+        while True:
+            jobs.requeue_stale_jobs()
+            succeeded, failed = jobs.run_pending(limit=options["batch"])
+            if succeeded or failed:
+                self.stdout.write(f"{succeeded} jobs done, {failed} failed")
+            elif options["once"]:
+                break
+            else:
+                time.sleep(options["sleep"])
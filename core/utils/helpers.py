@@ -28,6 +28,7 @@ import phonenumbers
 from notifications.signals import notify
 import requests
 import json
+import hashlib
 from django.utils import timezone
 
 # django models
@@ -145,6 +146,11 @@ def get_client_ip(request):
     return ip
 
 
+def make_etag(*parts):
+    """a strong etag of the parts eg the id and last_updated of an object"""
+    return '"%s"' % hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()
+
+
 def get_object(obj, path, default=None):
     """
     fails for nested lists so work on it love
@@ -228,14 +234,13 @@ def replace_variables(s="", variables=dict()):
     return s
 
 
-def handle_group_permissions(instance, group_permissions=[],  action="add"):
-    """Get all permissions from yml schema document and then assign to the user accordingly
+def get_permission_groups(instance, group_permissions=[]):
+    """Resolve the yml schema entries of an instance into the groups they point to
     Args:
-        instance (_type_): The object to assign permissions to
-        action (str, optional): add|remove. Defaults to "add".
+        instance (_type_): The object the permissions are meant for
         group_permissions (list, optional) the list of permissions to be assigned. If not given defaults to the schema file
     Returns:
-        _type_: _description_
+        list: [(group_name, permissions), ...] in the order they appear in the schema
     """
     if not group_permissions:
         obj_content_type = ContentType.objects.get_for_model(instance)
@@ -256,30 +261,8 @@ def handle_group_permissions(instance, group_permissions=[],  action="add"):
             return evaluated
         else:
             return get_class_attr(obj, path, default)
-        
-    def assign_permissions_to_group(group_name, permissions=[]):
-        group, group_created = Group.objects.get_or_create(name=group_name)
-        if group_created:
-            guessed_username = group_name.split()[0]
-            guessed_user = User.objects.filter(
-                username=guessed_username).first()
-            if guessed_user:
-                # give view only permission to user who is likely the owner of this group
-                assign_permissions_to_object(
-                    obj=group,
-                    user_or_group=guessed_user,
-                    permissions=["view_group"],
-                )
-        if action == "add":
-            assign_permissions_to_object(
-                obj=instance,
-                user_or_group=group,
-                permissions=permissions,
-            )
-        elif action == "remove":
-            for p in permissions:
-                remove_perm(p, group, instance)
 
+    groups = []
     for group_permission in group_permissions:
         category = ''
         if len(group_permission)>2:
@@ -298,7 +281,7 @@ def handle_group_permissions(instance, group_permissions=[],  action="add"):
                         group_name = get_group_name(
                             _item, category=category)
                         if group_name:
-                            assign_permissions_to_group(group_name, permissions)
+                            groups.append((group_name, permissions))
                 else:
                     group_name_parts.append(item)
                     group_name = " | ".join(
@@ -311,8 +294,81 @@ def handle_group_permissions(instance, group_permissions=[],  action="add"):
                                 ],
                             ))).strip()
                     if group_name:
-                        assign_permissions_to_group(group_name, permissions)
+                        groups.append((group_name, permissions))
+    return groups
+
+
+def assign_permissions_to_group(group_name, instance, permissions=[], action="add"):
+    """Create the group if missing and add/remove its permissions on the instance
+    Args:
+        group_name (str): name of the group, created if missing
+        instance (_type_): an object, or a list of objects of the same model for bulk assignment
+        permissions (list, optional): permissions to add or remove
+        action (str, optional): add|remove. Defaults to "add".
+    """
+    group, group_created = Group.objects.get_or_create(name=group_name)
+    if group_created:
+        guessed_username = group_name.split()[0]
+        guessed_user = User.objects.filter(
+            username=guessed_username).first()
+        if guessed_user:
+            # give view only permission to user who is likely the owner of this group
+            assign_permissions_to_object(
+                obj=group,
+                user_or_group=guessed_user,
+                permissions=["view_group"],
+            )
+    if action == "add":
+        if type(instance) is list:
+            model_name = get_content_type(instance[0]).model
+            for perm in permissions:
+                p = perm if len(perm.split("_")) > 1 else f"{perm}_{model_name}"
+                # guardian assigns in bulk when given a list of objects
+                assign_perm(p, group, instance)
+        else:
+            assign_permissions_to_object(
+                obj=instance,
+                user_or_group=group,
+                permissions=permissions,
+            )
+    elif action == "remove":
+        for obj in (instance if type(instance) is list else [instance]):
+            for p in permissions:
+                remove_perm(p, group, obj)
+
+
+def handle_group_permissions(instance, group_permissions=[],  action="add"):
+    """Get all permissions from yml schema document and then assign to the user accordingly
+    Args:
+        instance (_type_): The object to assign permissions to
+        action (str, optional): add|remove. Defaults to "add".
+        group_permissions (list, optional) the list of permissions to be assigned. If not given defaults to the schema file
+    Returns:
+        _type_: _description_
+    """
+    for group_name, permissions in get_permission_groups(instance, group_permissions):
+        assign_permissions_to_group(group_name, instance, permissions, action=action)
+    return True
+
 
+def handle_group_permissions_bulk(instances, group_permissions=[], action="add", key=None):
+    """Same as handle_group_permissions but for many objects of the same model
+    Args:
+        instances (list): The objects to assign permissions to
+        group_permissions (list, optional) the list of permissions to be assigned. If not given defaults to the schema file
+        action (str, optional): add|remove. Defaults to "add".
+        key (callable, optional): objects with the same key are assumed to resolve to the same groups,
+            so the schema is evaluated once per key instead of once per object. eg lambda r: (r.survey_id, r.user_id)
+    Returns:
+        bool
+    """
+    buckets = {}
+    for instance in instances:
+        buckets.setdefault(key(instance) if key else instance.pk, []).append(instance)
+
+    for items in buckets.values():
+        for group_name, permissions in get_permission_groups(items[0], group_permissions):
+            assign_permissions_to_group(group_name, items, permissions, action=action)
     return True
 
 def to_python_value(value):
@@ -453,3 +509,48 @@ def notify_users(
             channels=channels,
             **kwargs,
         )
+
+
+def bulk_notify_users(
+    users=[],
+    title=None,
+    body=None,
+    sender=None,
+    target=None,
+    action_object=None,
+    public=False,
+    level="info",
+    **data,
+):
+    """
+    Same as notify_users but writes all the notifications with a single insert.
+    The notifications signal is not sent, extra keyword arguments are saved in the data field
+    """
+    from notifications.models import Notification
+
+    users = list(User.objects.filter(id__in=users) if type(users) is list else users)
+    sender = sender or get_bot_user()
+    if not users or not sender:
+        return []
+    now = timezone.now()
+    notifications = []
+    for user in users:
+        notification = Notification(
+            recipient=user,
+            actor_content_type=get_content_type(sender),
+            actor_object_id=sender.pk,
+            verb=str(title),
+            description=body,
+            public=public,
+            level=level,
+            timestamp=now,
+        )
+        for obj, opt in [(target, "target"), (action_object, "action_object")]:
+            if obj is not None:
+                setattr(notification, f"{opt}_content_type", get_content_type(obj))
+                setattr(notification, f"{opt}_object_id", obj.pk)
+        if data:
+            notification.data = data
+        notifications.append(notification)
+    Notification.objects.bulk_create(notifications)
+    return notifications
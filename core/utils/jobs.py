@@ -0,0 +1,109 @@
+"""
+A small database backed job queue.
+
+Functions are queued by their dotted path with json serializable kwargs and
+run by `python manage.py run_jobs`. When settings.BACKGROUND_JOBS is off the
+function is called straight away so nothing changes for setups without a worker.
+"""
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count, F, Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from core.models import Job
+
+
+def enqueue(name, run_after=None, max_attempts=None, **kwargs):
+    """
+    queue the function at dotted path @name to be called with @kwargs
+    returns the Job, or None if the function was run straight away
+    """
+    if not getattr(settings, "BACKGROUND_JOBS", False):
+        import_string(name)(**kwargs)
+        return None
+    return Job.objects.create(
+        name=name,
+        kwargs=kwargs,
+        run_after=run_after or timezone.now(),
+        max_attempts=max_attempts or getattr(settings, "JOBS_MAX_ATTEMPTS", 5),
+    )
+
+
+def claim_jobs(limit=100):
+    """
+    mark up to @limit due jobs as running and return them.
+    The conditional update makes sure a job is only claimed by one worker
+    """
+    now = timezone.now()
+    ids = Job.objects.filter(status=Job.PENDING, run_after__lte=now).order_by(
+        "run_after", "id"
+    ).values_list("id", flat=True)[:limit]
+    claimed = []
+    for job_id in ids:
+        if Job.objects.filter(id=job_id, status=Job.PENDING).update(
+            status=Job.RUNNING, attempts=F("attempts") + 1, last_updated=now
+        ):
+            claimed.append(job_id)
+    return list(Job.objects.filter(id__in=claimed).order_by("run_after", "id"))
+
+
+def run_job(job):
+    """run a claimed job, retrying later with an exponential backoff if it fails"""
+    try:
+        import_string(job.name)(**job.kwargs)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+        else:
+            delay = getattr(settings, "JOBS_RETRY_DELAY", 30) * 2 ** (job.attempts - 1)
+            job.status = Job.PENDING
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+        job.save(update_fields=["status", "run_after", "last_error", "last_updated"])
+        return False
+
+    if getattr(settings, "JOBS_KEEP_DONE", False):
+        job.status = Job.DONE
+        job.save(update_fields=["status", "last_updated"])
+    else:
+        job.delete()
+    return True
+
+
+def requeue_stale_jobs():
+    """put back jobs left running by a worker which died, returns how many"""
+    timeout = getattr(settings, "JOBS_TIMEOUT", 600)
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        last_updated__lt=timezone.now() - timedelta(seconds=timeout),
+    ).update(status=Job.PENDING, last_updated=timezone.now())
+
+
+def run_pending(limit=100):
+    """run due jobs, returns (succeeded, failed)"""
+    succeeded = failed = 0
+    for job in claim_jobs(limit):
+        if run_job(job):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
+
+
+def backlog_stats():
+    """
+    number of jobs per status and the age in seconds of the oldest due job
+    eg {"pending": 12, "running": 1, "failed": 0, "done": 0, "due": 10, "oldest_due_age": 4.2}
+    """
+    stats = {status: 0 for status, __ in Job.STATUS_CHOICES}
+    for row in Job.objects.values("status").annotate(count=Count("id")):
+        stats[row["status"]] = row["count"]
+    due = Job.objects.filter(status=Job.PENDING, run_after__lte=timezone.now()).aggregate(
+        count=Count("id"), oldest=Min("run_after")
+    )
+    stats["due"] = due["count"]
+    stats["oldest_due_age"] = (
+        (timezone.now() - due["oldest"]).total_seconds() if due["oldest"] else 0
+    )
+    return stats
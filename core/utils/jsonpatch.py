@@ -0,0 +1,110 @@
+"""
+Apply RFC 6902 JSON Patch operations, eg
+[{"op": "add", "path": "/name", "value": "a"}, {"op": "remove", "path": "/age"}]
+"""
+from copy import deepcopy
+
+
+class JsonPatchError(ValueError):
+    pass
+
+
+def parse_pointer(path):
+    """RFC 6901 json pointer to a list of keys, "/a/b~1c" gives ["a", "b/c"]"""
+    if path == "":
+        return []
+    if not isinstance(path, str) or not path.startswith("/"):
+        raise JsonPatchError('Invalid path "%s"' % path)
+    return [part.replace("~1", "/").replace("~0", "~") for part in path[1:].split("/")]
+
+
+def get_index(container, key, adding=False):
+    if key == "-" and adding:
+        return len(container)
+    if not key.isdigit() or (len(key) > 1 and key.startswith("0")):
+        raise JsonPatchError('Invalid list index "%s"' % key)
+    index = int(key)
+    if index > len(container) or (index == len(container) and not adding):
+        raise JsonPatchError('List index "%s" out of range' % key)
+    return index
+
+
+def resolve(document, keys):
+    """the value at the keys"""
+    for key in keys:
+        if isinstance(document, dict):
+            if key not in document:
+                raise JsonPatchError('Path "%s" not found' % key)
+            document = document[key]
+        elif isinstance(document, list):
+            document = document[get_index(document, key)]
+        else:
+            raise JsonPatchError('Path "%s" not found' % key)
+    return document
+
+
+def add(document, keys, value):
+    if not keys:
+        return value
+    parent = resolve(document, keys[:-1])
+    if isinstance(parent, dict):
+        parent[keys[-1]] = value
+    elif isinstance(parent, list):
+        parent.insert(get_index(parent, keys[-1], adding=True), value)
+    else:
+        raise JsonPatchError('Cannot add to "%s"' % keys[-1])
+    return document
+
+
+def remove(document, keys):
+    if not keys:
+        raise JsonPatchError("Cannot remove the whole document")
+    parent = resolve(document, keys[:-1])
+    if isinstance(parent, dict):
+        if keys[-1] not in parent:
+            raise JsonPatchError('Path "%s" not found' % keys[-1])
+        return parent.pop(keys[-1])
+    if isinstance(parent, list):
+        return parent.pop(get_index(parent, keys[-1]))
+    raise JsonPatchError('Path "%s" not found' % keys[-1])
+
+
+def apply_patch(document, operations):
+    """
+    apply the operations in order and return the patched document.
+    The document is changed in place, pass a copy if the original must be kept on errors
+    """
+    if not isinstance(operations, list):
+        raise JsonPatchError("A patch must be a list of operations")
+    for operation in operations:
+        if not isinstance(operation, dict) or "path" not in operation:
+            raise JsonPatchError("Every operation needs an op and a path")
+        op = operation.get("op")
+        keys = parse_pointer(operation["path"])
+        if op in ["add", "replace", "test"] and "value" not in operation:
+            raise JsonPatchError('"%s" needs a value' % op)
+
+        if op == "add":
+            document = add(document, keys, deepcopy(operation["value"]))
+        elif op == "remove":
+            remove(document, keys)
+        elif op == "replace":
+            if keys:
+                resolve(document, keys)
+                remove(document, keys)
+            document = add(document, keys, deepcopy(operation["value"]))
+        elif op in ["move", "copy"]:
+            from_keys = parse_pointer(operation.get("from"))
+            if op == "move":
+                if keys[: len(from_keys)] == from_keys and keys != from_keys:
+                    raise JsonPatchError("Cannot move a value into itself")
+                value = remove(document, from_keys)
+            else:
+                value = deepcopy(resolve(document, from_keys))
+            document = add(document, keys, value)
+        elif op == "test":
+            if resolve(document, keys) != operation["value"]:
+                raise JsonPatchError('Test failed at "%s"' % operation["path"])
+        else:
+            raise JsonPatchError('Unknown operation "%s"' % op)
+    return document
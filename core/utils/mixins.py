@@ -713,7 +713,6 @@ class MixinViewSet(QueryArgumentsMixin):
         search = self.request.GET.get("search", "")
         order_by = self.request.GET.get("order_by")
         order_by_field = self.get_field(order_by) if order_by else None
-        firstItem = queryset.first()
 
         distinct = self.request.GET.get("distinct")
         filters = self.get_params_data()
@@ -743,7 +742,8 @@ class MixinViewSet(QueryArgumentsMixin):
         # first check if distinct and order_by are valid fields
 
         # print("The order_by is here", order_by, order_by_field)
-        if order_by_field and hasattr(firstItem, order_by_field):
+        # checked on the model so no row is loaded for it
+        if order_by_field and hasattr(queryset.model, order_by_field):
             try:
                 if distinct:
                     queryset = queryset.distinct(order_by_field).order_by(order_by)
@@ -29,3 +29,15 @@ class CustomPagination(pagination.PageNumberPagination):
                 "results": data,
             }
         )
+
+
+class CursorPagination(pagination.CursorPagination):
+    """
+    pages which stay consistent while rows are added and cost the same at any depth,
+    the cursor is an opaque ?cursor= given in the next and previous links
+    """
+
+    page_size = 50
+    page_size_query_param = "size"
+    max_page_size = 1000
+    ordering = "id"
@@ -0,0 +1,87 @@
+"""
+Parsers which accept compressed request bodies, following the Content-Encoding header.
+gzip is always available, zstd needs the zstandard package of the requirements
+"""
+import gzip
+import io
+import zlib
+from django.conf import settings
+from rest_framework import parsers, status
+from rest_framework.exceptions import APIException, ParseError, UnsupportedMediaType
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class RequestEntityTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "The decompressed request body is too large."
+    default_code = "request_entity_too_large"
+
+
+class SizeLimitedReader(io.RawIOBase):
+    """
+    reads a decompressing stream chunk by chunk and stops once more than max_size bytes came out
+    """
+
+    def __init__(self, raw, max_size=None):
+        self.raw = raw
+        self.max_size = max_size
+        self.read_size = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        try:
+            data = self.raw.read(len(buffer))
+        except (OSError, EOFError, zlib.error) as e:
+            raise ParseError("Invalid compressed request body - %s" % e)
+        except Exception as e:
+            if zstandard is not None and isinstance(e, zstandard.ZstdError):
+                raise ParseError("Invalid compressed request body - %s" % e)
+            raise
+        self.read_size += len(data)
+        if self.max_size and self.read_size > self.max_size:
+            raise RequestEntityTooLarge()
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def decompress_stream(stream, encoding=None, max_size=None):
+    """
+    wrap the stream of a request so it is decompressed while being read
+    @encoding the Content-Encoding header eg gzip, zstd
+    @max_size the most bytes the decompressed body may have, defaults to settings.MAX_DECOMPRESSED_REQUEST_SIZE
+    """
+    encoding = (encoding or "identity").strip().lower()
+    if encoding == "identity":
+        return stream
+    if encoding in ["gzip", "x-gzip"]:
+        raw = gzip.GzipFile(fileobj=stream, mode="rb")
+    elif encoding == "zstd" and zstandard is not None:
+        raw = zstandard.ZstdDecompressor().stream_reader(stream)
+    else:
+        raise UnsupportedMediaType(encoding, detail='Unsupported Content-Encoding "%s"' % encoding)
+    if max_size is None:
+        max_size = getattr(settings, "MAX_DECOMPRESSED_REQUEST_SIZE", None)
+    return io.BufferedReader(SizeLimitedReader(raw, max_size))
+
+
+class DecompressMixin:
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get("request")
+        encoding = request.META.get("HTTP_CONTENT_ENCODING") if request is not None else None
+        if stream is not None and encoding:
+            stream = decompress_stream(stream, encoding)
+        return super().parse(stream, media_type=media_type, parser_context=parser_context)
+
+
+class JSONParser(DecompressMixin, parsers.JSONParser):
+    pass
+
+
+class FormParser(DecompressMixin, parsers.FormParser):
+    pass
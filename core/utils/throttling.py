@@ -0,0 +1,109 @@
+"""
+Token bucket rate limiting backed by the django cache.
+
+A bucket holds up to `count` tokens and is refilled at count/period tokens per second,
+so a client can burst up to the full count and is then limited to the average rate.
+The buckets of a request are read and written with one get_many/set_many, a few
+requests racing on the same bucket may all be let through, which is fine for admission control.
+The cache has to be shared by the worker processes (CACHES in the settings), a per process
+cache gives every process its own buckets and the limits are multiplied by the number of processes.
+"""
+import time
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """"100/min" to (100, 60), None for no limit"""
+    if not rate:
+        return None
+    count, period = str(rate).split("/")
+    if int(count) < 1:
+        raise ValueError("A rate needs at least one request")
+    return int(count), PERIODS[period.strip()[0]]
+
+
+class Bucket:
+    def __init__(self, key, rate, cost=1):
+        self.capacity, self.period = rate
+        # a new rate starts with a full bucket
+        self.key = "throttle:%s:%s/%s" % (key, self.capacity, self.period)
+        # a batch bigger than the bucket drains it instead of never passing
+        self.cost = min(cost, self.capacity)
+        self.tokens = self.capacity
+
+    def load(self, state, now):
+        if state:
+            tokens, updated = state
+            self.tokens = min(
+                self.capacity, tokens + (now - updated) * self.capacity / self.period
+            )
+
+    def wait(self):
+        """seconds until the bucket has enough tokens"""
+        return max(0, (self.cost - self.tokens) * self.period / self.capacity)
+
+
+def take(buckets):
+    """
+    take the tokens from every bucket if all of them have enough
+    returns the seconds to wait, 0 if the tokens were taken
+    """
+    if not buckets:
+        return 0
+    now = time.time()
+    states = cache.get_many([bucket.key for bucket in buckets])
+    for bucket in buckets:
+        bucket.load(states.get(bucket.key), now)
+    wait = max(bucket.wait() for bucket in buckets)
+    if not wait:
+        for bucket in buckets:
+            bucket.tokens -= bucket.cost
+        # an untouched bucket is full again after one period
+        cache.set_many(
+            {bucket.key: (bucket.tokens, now) for bucket in buckets},
+            max(bucket.period for bucket in buckets),
+        )
+    return wait
+
+
+def peek(key, rate):
+    """tokens left in a bucket without taking any"""
+    bucket = Bucket(key, rate)
+    bucket.load(cache.get(bucket.key), time.time())
+    return bucket.tokens
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    subclasses return the buckets of a request, the request is let through
+    only if every bucket has enough tokens. DRF answers 429 with a Retry-After header
+    """
+
+    wait_time = None
+
+    def get_buckets(self, request, view):
+        return []
+
+    def allow_request(self, request, view):
+        self.wait_time = take(self.get_buckets(request, view))
+        self.on_request(request, view, allowed=not self.wait_time)
+        return not self.wait_time
+
+    def on_request(self, request, view, allowed=True):
+        """called after every request, eg to count them"""
+        pass
+
+    def wait(self):
+        return self.wait_time
+
+
+def validate_rate(value):
+    """model field validator of a rate eg 100/min"""
+    try:
+        parse_rate(value)
+    except (ValueError, KeyError, IndexError):
+        raise ValidationError('"%s" is not a rate like 100/min' % value)
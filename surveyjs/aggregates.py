@@ -0,0 +1,288 @@
+"""
+Per question aggregates of the results of a survey, for dashboards.
+
+The questions come from the survey json: choice questions get the count of every
+answer, number questions (rating, number inputs) their min, max and mean, and every
+question its answered / skipped totals. PostgreSQL computes them with json operators in
+two queries, other databases read the answers in chunks into pandas
+"""
+import json
+from django.conf import settings
+from django.db import connections
+from .validators import CHOICE_TYPES, NO_VALUE_TYPES, is_number
+
+MULTIPLE_CHOICE_TYPES = {"checkbox", "tagbox"}
+NUMBER_INPUT_TYPES = {"number", "range"}
+EMPTY_VALUES = ["", [], {}]
+
+
+def get_kind(element):
+    """choice, choices (several answers), number or None for the questions only counted"""
+    question_type = element.get("type")
+    if question_type in CHOICE_TYPES or question_type == "boolean":
+        return "choice"
+    if question_type in MULTIPLE_CHOICE_TYPES:
+        return "choices"
+    if question_type == "rating" or (
+        question_type == "text" and element.get("inputType") in NUMBER_INPUT_TYPES
+    ):
+        return "number"
+    return None
+
+
+def get_questions(survey_json):
+    """the questions of the survey in order eg [{"name": "age", "type": "text", "kind": "number"}, ...]"""
+    survey_json = survey_json if isinstance(survey_json, dict) else {}
+    questions = []
+    names = set()
+
+    def walk(elements):
+        for element in elements or []:
+            if not isinstance(element, dict):
+                continue
+            if element.get("type") in ["panel", "flowpanel"]:
+                walk(element.get("elements") or element.get("questions"))
+                continue
+            if element.get("type") in NO_VALUE_TYPES or not element.get("name"):
+                continue
+            name = str(element.get("valueName") or element["name"])
+            if name in names:
+                continue
+            names.add(name)
+            questions.append({"name": name, "type": element.get("type"), "kind": get_kind(element)})
+
+    for page in survey_json.get("pages") or [survey_json]:
+        if isinstance(page, dict):
+            walk(page.get("elements") or page.get("questions"))
+    return questions
+
+
+def to_text(value):
+    """an answer as a choice key, the way postgres ->> prints it"""
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def is_empty(value):
+    return any(value == empty and type(value) is type(empty) for empty in EMPTY_VALUES)
+
+
+def empty_summary(question):
+    summary = {"name": question["name"], "type": question["type"], "answered": 0, "skipped": 0}
+    if question["kind"] in ["choice", "choices"]:
+        summary["choices"] = {}
+    if question["kind"] == "number":
+        summary.update({"min": None, "max": None, "mean": None})
+    return summary
+
+
+def aggregate_postgresql(qs, questions):
+    connection = connections[qs.db]
+    sql, params = qs.values("data").query.sql_with_params()
+    columns = ["count(*)"]
+    column_params = []
+    for question in questions:
+        columns.append(
+            "count(*) FILTER (WHERE r.data -> %s IS NOT NULL"
+            " AND r.data -> %s NOT IN ('null', '\"\"', '[]', '{}'))"
+        )
+        column_params += [question["name"]] * 2
+        if question["kind"] == "number":
+            for function in ["min", "max", "avg"]:
+                # filtered rows only are cast, other answers can be any json
+                columns.append(
+                    "%s((r.data ->> %%s)::float) FILTER (WHERE jsonb_typeof(r.data -> %%s) = 'number')"
+                    % function
+                )
+                column_params += [question["name"]] * 2
+    choices = []
+    choice_params = []
+    for question in questions:
+        if question["kind"] == "choice":
+            choices.append(
+                "SELECT %%s, r.data ->> %%s, count(*) FROM (%s) r"
+                " WHERE jsonb_typeof(r.data -> %%s) IN ('string', 'number', 'boolean') GROUP BY 2" % sql
+            )
+            # in the order of the placeholders, the subquery is between the select and the where
+            choice_params += [question["name"]] * 2 + list(params) + [question["name"]]
+        elif question["kind"] == "choices":
+            choices.append(
+                "SELECT %%s, value, count(*) FROM (%s) r, jsonb_array_elements_text("
+                "CASE WHEN jsonb_typeof(r.data -> %%s) = 'array' THEN r.data -> %%s ELSE '[]' END) value"
+                " GROUP BY 2" % sql
+            )
+            choice_params += [question["name"]] + list(params) + [question["name"]] * 2
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT %s FROM (%s) r" % (", ".join(columns), sql), column_params + list(params)
+        )
+        row = list(cursor.fetchone())
+        counts = []
+        if choices:
+            cursor.execute(" UNION ALL ".join(choices), choice_params)
+            counts = cursor.fetchall()
+
+    total = row.pop(0)
+    summaries = {}
+    for question in questions:
+        summary = summaries[question["name"]] = empty_summary(question)
+        summary["answered"] = row.pop(0)
+        summary["skipped"] = total - summary["answered"]
+        if question["kind"] == "number":
+            summary["min"], summary["max"], summary["mean"] = row.pop(0), row.pop(0), row.pop(0)
+    for name, value, count in sorted(counts, key=lambda count: -count[2]):
+        summaries[name]["choices"][value] = count
+    return total, summaries
+
+
+def aggregate_pandas(qs, questions, chunk_size=None):
+    import pandas as pd
+
+    chunk_size = chunk_size or getattr(settings, "SURVEYJS_STREAM_CHUNK_SIZE", 2000)
+    names = [question["name"] for question in questions]
+    total = 0
+    answered = pd.Series(0, index=names, dtype="int64")
+    choices = {}
+    numbers = {}
+
+    def add(chunk):
+        nonlocal total, answered
+        # only the columns of the questions are kept from the result documents
+        frame = pd.DataFrame.from_records(
+            [data if isinstance(data, dict) else {} for data in chunk], columns=names
+        )
+        total += len(frame)
+        answered = answered.add((frame.notna() & ~frame.map(is_empty)).sum(), fill_value=0)
+        for question in questions:
+            column = frame[question["name"]].dropna()
+            if question["kind"] == "choice":
+                column = column[column.map(lambda value: isinstance(value, (str, int, float)))]
+                counts = column.map(to_text).value_counts()
+            elif question["kind"] == "choices":
+                column = column[column.map(lambda value: isinstance(value, list))].explode().dropna()
+                counts = column.map(to_text).value_counts()
+            elif question["kind"] == "number":
+                column = column[column.map(is_number)].astype("float64")
+                if len(column):
+                    stats = numbers.setdefault(question["name"], {"min": [], "max": [], "sum": 0.0, "count": 0})
+                    stats["min"].append(column.min())
+                    stats["max"].append(column.max())
+                    stats["sum"] += column.sum()
+                    stats["count"] += len(column)
+                continue
+            else:
+                continue
+            choices[question["name"]] = choices.get(question["name"], pd.Series(dtype="int64")).add(
+                counts, fill_value=0
+            )
+
+    chunk = []
+    for data in qs.values_list("data", flat=True).iterator(chunk_size=chunk_size):
+        chunk.append(data)
+        if len(chunk) >= chunk_size:
+            add(chunk)
+            chunk = []
+    if chunk:
+        add(chunk)
+
+    summaries = {}
+    for question in questions:
+        summary = summaries[question["name"]] = empty_summary(question)
+        summary["answered"] = int(answered[question["name"]])
+        summary["skipped"] = total - summary["answered"]
+        if question["name"] in choices:
+            counts = choices[question["name"]].sort_values(ascending=False, kind="stable")
+            summary["choices"] = {value: int(count) for value, count in counts.items()}
+        if question["name"] in numbers:
+            stats = numbers[question["name"]]
+            summary["min"] = float(min(stats["min"]))
+            summary["max"] = float(max(stats["max"]))
+            summary["mean"] = stats["sum"] / stats["count"]
+    return total, summaries
+
+
+def aggregate(survey, qs):
+    """
+    the aggregates of the results in qs, eg
+    {"total": 10, "questions": [{"name": "region", "type": "radiogroup", "answered": 9, "skipped": 1, "choices": {"north": 6, "south": 3}}, ...]}
+    """
+    questions = get_questions(survey.json)
+    if not questions:
+        return {"total": qs.count(), "questions": []}
+    if connections[qs.db].vendor == "postgresql":
+        total, summaries = aggregate_postgresql(qs, questions)
+    else:
+        total, summaries = aggregate_pandas(qs, questions)
+    return {"total": total, "questions": [summaries[question["name"]] for question in questions]}
+
+
+def iter_columns(qs, names, chunk_size=None):
+    """
+    chunks of rows holding only the answers of the questions @names,
+    the database extracts them so the rest of the result documents is never read
+    """
+    from django.db.models.fields.json import KeyTransform
+
+    chunk_size = chunk_size or getattr(settings, "SURVEYJS_STREAM_CHUNK_SIZE", 2000)
+    aliases = {"answer_%s" % index: KeyTransform(name, "data") for index, name in enumerate(names)}
+    chunk = []
+    for row in qs.order_by().annotate(**aliases).values_list(*aliases).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def pivot(qs, rows, columns, normalize="all", chunk_size=None):
+    """
+    a cross tab of the answers of the questions @rows against the answers of the questions @columns,
+    a result with several answers (checkbox) is counted once per answer and results skipping one of the questions are left out.
+    @normalize the percentages are of the total (all), of their row (rows) or of their column (columns)
+    returns {"rows": ["region"], "columns": ["crops"], "row_keys": [["north"], ["south"]], "column_keys": [["beans"], ["maize"]],
+        "counts": [[1, 2], [0, 1]], "percentages": [[25.0, 50.0], [0.0, 25.0]], "row_totals": [3, 1], "column_totals": [1, 3], "total": 4}
+    """
+    import pandas as pd
+
+    names = list(rows) + list(columns)
+    counts = None
+    for chunk in iter_columns(qs, names, chunk_size):
+        frame = pd.DataFrame.from_records(chunk, columns=names)
+        for name in names:
+            frame = frame.explode(name)
+        frame = frame.dropna()
+        if frame.empty:
+            continue
+        frame = frame.map(to_text)
+        size = frame.groupby(names).size()
+        counts = size if counts is None else counts.add(size, fill_value=0)
+
+    if counts is None:
+        matrix = pd.DataFrame()
+    else:
+        matrix = counts.unstack(list(range(len(rows), len(names))), fill_value=0).astype("int64")
+    total = int(matrix.values.sum())
+    row_totals = matrix.sum(axis=1)
+    column_totals = matrix.sum(axis=0)
+    if normalize == "rows":
+        percentages = matrix.div(row_totals.replace(0, 1), axis=0)
+    elif normalize == "columns":
+        percentages = matrix.div(column_totals.replace(0, 1), axis=1)
+    else:
+        percentages = matrix / (total or 1)
+
+    def get_keys(index):
+        return [list(key) if isinstance(key, tuple) else [key] for key in index]
+
+    return {
+        "rows": list(rows),
+        "columns": list(columns),
+        "row_keys": get_keys(matrix.index),
+        "column_keys": get_keys(matrix.columns),
+        "counts": matrix.values.tolist(),
+        "percentages": (percentages * 100).round(2).values.tolist(),
+        "row_totals": [int(count) for count in row_totals],
+        "column_totals": [int(count) for count in column_totals],
+        "total": total,
+    }
@@ -0,0 +1,227 @@
+"""
+Typed answers of the results in the Answer table, and the answer filters of the results.
+
+Every answer of a question of the survey is stored as text (numbers and booleans as json)
+and, when it is a number, as a float, with indexes on (survey, question, value).
+The rows of a result are written again by the index_result job every time its data changes,
+and for bulk inserts by the on_results_created job. The results saved before the Answer table
+are indexed by migration 0012.
+
+Results are filtered with ?answer.<path>[__<operator>]=<value> eg
+?answer.region=north&answer.age__gt=40&answer.crops__contains=maize&answer.age__range=18,40
+&answer.phone__exists=false&answer.household.size__gte=4
+The operators are exact (the default), in, gt, gte, lt, lte, range, contains and exists.
+A question of the survey is looked up in the Answer table. A path into the value of a
+question (matrix.row.column) or another key is looked up in Result.data: on PostgreSQL exact, in and contains
+are json containment (@>) served by the GIN jsonb_path_ops index of Result.data, other databases
+(SQLite) and the other operators read the json of every result of the survey, so those filters
+need the survey (survey__id) and are limited to settings.SURVEYJS_MAX_ANSWER_FILTERS per request
+"""
+import json
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from . import aggregates
+from . import models
+from . import summaries
+from .validators import is_number
+
+PREFIX = "answer."
+OPERATORS = {"exact", "in", "gt", "gte", "lt", "lte", "range", "contains", "exists"}
+MAX_PATH_DEPTH = 5
+
+
+def to_number(value):
+    if is_number(value):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def get_answers(result, questions, answer_model=models.Answer):
+    """the unsaved Answer rows of a result, @answer_model is the historical model in migrations"""
+    data = result.data if isinstance(result.data, dict) else {}
+    answers = []
+    for question in questions:
+        value = data.get(question["name"])
+        values = value if isinstance(value, list) else [value]
+        for value in values:
+            # objects (matrices, panels) are only in Result.data
+            if value is None or isinstance(value, (dict, list)) or aggregates.is_empty(value):
+                continue
+            number = float(value) if is_number(value) else None
+            if question["kind"] == "number":
+                # numbers typed in a text input of type number can be posted as text
+                number = to_number(value)
+            answers.append(
+                answer_model(
+                    result_id=result.id,
+                    survey_id=result.survey_id,
+                    question=question["name"][:255],
+                    text_value=aggregates.to_text(value)[:255],
+                    number_value=number,
+                )
+            )
+    return answers
+
+
+def index_results(results, created=False):
+    """write the answers of saved results again, with created=True there are none to delete"""
+    answers = []
+    for result in results:
+        answers += get_answers(result, summaries.get_questions(result.survey_id, result.version_id))
+    with transaction.atomic():
+        if not created:
+            models.Answer.objects.filter(result_id__in=[result.id for result in results]).delete()
+        models.Answer.objects.bulk_create(answers, batch_size=1000)
+
+
+def index_result(result_id, created=False):
+    """write the answers of a saved result again, queued by Result_post_save when its data changes"""
+    result = models.Result.objects.filter(id=result_id).only("id", "survey_id", "version_id", "data").first()
+    if result is not None:
+        index_results([result], created=created)
+
+
+def rebuild(survey, chunk_size=None):
+    """index the answers of every result of the survey again, returns the number of results"""
+    chunk_size = chunk_size or getattr(settings, "SURVEYJS_STREAM_CHUNK_SIZE", 2000)
+    count = 0
+    chunk = []
+    results = models.Result.objects.filter(survey=survey).only("id", "survey_id", "version_id", "data")
+    for result in results.iterator(chunk_size=chunk_size):
+        chunk.append(result)
+        if len(chunk) >= chunk_size:
+            index_results(chunk)
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        index_results(chunk)
+        count += len(chunk)
+    return count
+
+
+def get_filters(params):
+    """[(path, operator, value)] of the answer.<path>[__<operator>] params, path eg ["matrix", "row"]"""
+    filters = []
+    for key, value in params.items():
+        if not key.startswith(PREFIX):
+            continue
+        path, operator = key[len(PREFIX):], "exact"
+        if "__" in path and path.rsplit("__", 1)[1] in OPERATORS:
+            path, operator = path.rsplit("__", 1)
+        path = path.split(".")
+        if not all(path) or len(path) > MAX_PATH_DEPTH:
+            raise ValidationError({key: ["Must be a question name or a path of up to %s names." % MAX_PATH_DEPTH]})
+        filters.append((path, operator, value))
+    max_filters = getattr(settings, "SURVEYJS_MAX_ANSWER_FILTERS", 10)
+    if len(filters) > max_filters:
+        raise ValidationError({"answer": ["At most %s answer filters are allowed." % max_filters]})
+    return filters
+
+
+def to_json(value):
+    """a value of the query string as json eg "40" is 40, "true" is True, "north" stays a string"""
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def get_range(value):
+    low, __, high = value.partition(",")
+    return low or None, high or None
+
+
+def filter_answers(answers, operator, value):
+    """the Answer rows matching one filter on a question"""
+    if operator in ["exact", "contains"]:
+        # a question with several answers has one row per answer
+        return answers.filter(text_value=value)
+    if operator == "in":
+        return answers.filter(text_value__in=value.split(","))
+    if operator == "range":
+        low, high = get_range(value)
+        if low is not None:
+            answers = filter_answers(answers, "gte", low)
+        if high is not None:
+            answers = filter_answers(answers, "lte", high)
+        return answers
+    if to_number(value) is not None:
+        return answers.filter(**{"number_value__%s" % operator: to_number(value)})
+    # iso dates and times compare as text
+    return answers.filter(**{"text_value__%s" % operator: value})
+
+
+def nest(path, value):
+    """["matrix", "row"], "a" gives {"matrix": {"row": "a"}}"""
+    for key in reversed(path):
+        value = {key: value}
+    return value
+
+
+def get_json_query(path, operator, value, vendor):
+    """a Q on Result.data for a filter on a path into the value of a question"""
+    lookup = "data__" + "__".join(path)
+    if operator == "exists":
+        query = Q(**{"__".join(["data"] + path[:-1] + ["has_key"]): path[-1]})
+        return ~query if to_json(value) is False else query
+    if operator in ["exact", "in", "contains"]:
+        values = value.split(",") if operator == "in" else [value]
+        query = Q()
+        for value in values:
+            # "40" matches the number 40 and the text "40"
+            candidates = {json.dumps(item): item for item in [value, to_json(value)]}.values()
+            for candidate in candidates:
+                if operator == "contains":
+                    candidate = [candidate]
+                if vendor == "postgresql":
+                    # @> is served by the jsonb_path_ops index
+                    query |= Q(data__contains=nest(path, candidate))
+                elif operator == "contains":
+                    # json containment is postgres only, the json text of the list is searched instead
+                    query |= Q(**{"%s__icontains" % lookup: json.dumps(candidate[0])})
+                else:
+                    query |= Q(**{lookup: candidate})
+        return query
+    if operator == "range":
+        low, high = get_range(value)
+        query = Q()
+        if low is not None:
+            query &= Q(**{"%s__gte" % lookup: to_json(low)})
+        if high is not None:
+            query &= Q(**{"%s__lte" % lookup: to_json(high)})
+        return query
+    return Q(**{"%s__%s" % (lookup, operator): to_json(value)})
+
+
+def filter_results(qs, params, survey_id=None):
+    """the results of qs matching every answer filter of the request params"""
+    filters = get_filters(params)
+    indexed = None
+    if filters and survey_id:
+        survey_json = models.Survey.objects.filter(id=survey_id).values_list("json", flat=True).first()
+        indexed = {question["name"] for question in aggregates.get_questions(survey_json)}
+    for path, operator, value in filters:
+        # keys which are not questions of the survey are not in the Answer table
+        if len(path) == 1 and (indexed is None or path[0] in indexed):
+            answers = models.Answer.objects.filter(question=path[0])
+            if survey_id:
+                answers = answers.filter(survey_id=survey_id)
+            if operator == "exists":
+                if to_json(value) is False:
+                    qs = qs.exclude(id__in=answers.values("result_id"))
+                else:
+                    qs = qs.filter(id__in=answers.values("result_id"))
+                continue
+            qs = qs.filter(id__in=filter_answers(answers, operator, value).values("result_id"))
+            continue
+        if not survey_id:
+            raise ValidationError({PREFIX + ".".join(path): ["Filters on a path need the survey (survey__id)."]})
+        qs = qs.filter(get_json_query(path, operator, value, connections[qs.db].vendor))
+    return qs
@@ -1,10 +1,32 @@
+import tempfile
 from copy import copy
 from uuid import uuid4
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, permissions
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
 from . import serializers
 from . import models
+from . import aggregates
+from . import answers
+from . import drafts
+from . import exports
+from . import importer
+from . import locales
+from . import payloads
+from . import runtime
+from . import snapshots
+from . import spool
+from . import submissions
+from . import summaries
+from . import throttling
+from . import validators
 from core.utils.mixins import MixinViewSet
+from core.utils import helpers, jsonpatch, pagination, parsers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.authentication import (
@@ -14,6 +36,7 @@ from rest_framework.authentication import (
 )
 from dj_rest_auth.jwt_auth import JWTCookieAuthentication
 from django.utils.translation import gettext as _
+from guardian.utils import get_anonymous_user
 from guardian.shortcuts import (
     get_perms,
     get_objects_for_user,
@@ -54,33 +77,183 @@ class SurveyViewSet(MixinViewSet, viewsets.ModelViewSet):
     @action(
         permission_classes=[permissions.AllowAny],
         detail=False,
+        throttle_classes=[throttling.SurveyReadThrottle],
         methods=["GET"],
         name=_("Get active surveys"),
     )
     def getActive(self, request, *args, **kwargs):
         """
-        creates responses in bulk from the survey data
+        creates responses in bulk from the survey data.
+        ?listing=1 leaves out the json of the surveys, it is not even read from the database.
+        ?cursor= or ?size= returns a page eg {"next": "...", "previous": null, "results": [...]}
         """
         qs = self.filter_queryset(self.get_queryset().filter(is_active=True))
-        data = self.serializer_class(
-            qs, many=True, context=self.get_serializer_context()
-        ).data
-        return Response(data)
+        # the list changes when a survey is updated, added or removed
+        state = qs.aggregate(last_updated=Max("last_updated"), count=Count("id"))
+        etag = self.get_etag("active", state["count"], state["last_updated"])
+        not_modified = self.not_modified(etag, state["last_updated"])
+        if not_modified:
+            return not_modified
+        serializer_class = self.serializer_class
+        qs = qs.select_related("user")
+        if request.GET.get("listing") in ["1", "true", "True"]:
+            serializer_class = serializers.SurveyListingSerializer
+            qs = qs.defer("json")
+
+        def get_data():
+            if "cursor" not in request.GET and "size" not in request.GET:
+                return serializer_class(qs, many=True, context=self.get_serializer_context()).data
+            paginator = pagination.CursorPagination()
+            page = paginator.paginate_queryset(qs, request, view=self)
+            return paginator.get_paginated_response(
+                serializer_class(page, many=True, context=self.get_serializer_context()).data
+            ).data
+
+        response = self.cached_response(payloads.ALL_SURVEYS, etag, get_data)
+        return self.set_validators(response, etag, state["last_updated"])
 
     @action(
         permission_classes=[permissions.AllowAny],
         detail=False,
+        throttle_classes=[throttling.SurveyReadThrottle],
         methods=["GET"],
         name=_("Get a specific survey"),
     )
     def getSurvey(self, request, *args, **kwargs):
         """
-        get a specific survey using survey Id
+        get a specific survey using survey Id.
+        The json is the runtime form for respondents, ?variant=full gives the document of the editor.
+        A multilingual runtime json is sliced to the language of ?locale= or of the Accept-Language header,
+        ?locale=all keeps every language. The full json keeps every language unless ?locale= is given,
+        the editor saves it back with changeJson
         """
         survey_id = request.GET.get("surveyId", 0)
-        qs = self.filter_queryset(self.get_queryset()).filter(pk=survey_id).first()
-        data = self.serializer_class(qs, context=self.get_serializer_context()).data
-        return Response(data)
+        variant = "full" if request.GET.get("variant") == "full" else "runtime"
+        locale = request.GET.get("locale") or ("all" if variant == "full" else None)
+        accept_language = "" if locale else request.META.get("HTTP_ACCEPT_LANGUAGE", "")
+        qs = self.filter_queryset(self.get_queryset()).filter(pk=survey_id)
+        # a client with the current version is answered before the survey is loaded
+        last_updated = qs.values_list("last_updated", flat=True).first()
+        if last_updated is None:
+            return Response(self.serializer_class(None, context=self.get_serializer_context()).data)
+        etag = self.get_etag("survey", survey_id, last_updated, accept_language)
+        not_modified = self.not_modified(etag, last_updated)
+        if not_modified:
+            return not_modified
+
+        def get_data():
+            survey = qs.first()
+            data = self.serializer_class(survey, context=self.get_serializer_context()).data
+            if "json" in data:
+                survey_json = survey.json if variant == "full" else runtime.get_runtime_json(survey)
+                if locale != "all":
+                    survey_json = locales.get_localized_json(
+                        survey, survey_json, variant, locale, accept_language
+                    )
+                data["json"] = survey_json
+            return data
+
+        response = self.cached_response(survey_id, etag, get_data)
+        patch_vary_headers(response, ["Accept-Language"])
+        return self.set_validators(response, etag, last_updated)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        the detail of a survey, answered like getSurvey from the cached body while the survey is unchanged
+        """
+        survey_id = kwargs.get(self.lookup_field)
+        last_updated = (
+            self.filter_queryset(self.get_queryset())
+            .filter(pk=survey_id)
+            .values_list("last_updated", flat=True)
+            .first()
+        )
+        if last_updated is None:
+            return super().retrieve(request, *args, **kwargs)
+        etag = self.get_etag("detail", survey_id, last_updated)
+        not_modified = self.not_modified(etag, last_updated)
+        if not_modified:
+            return not_modified
+        response = self.cached_response(
+            survey_id, etag, lambda: super(SurveyViewSet, self).retrieve(request, *args, **kwargs).data
+        )
+        return self.set_validators(response, etag, last_updated)
+
+    def cached_response(self, survey_id, etag, get_data):
+        """
+        a response with the rendered bytes of get_data() kept in payloads, only json is cached
+        """
+        request = self.request
+        if request.accepted_renderer.format != "json":
+            return Response(get_data())
+        content = payloads.get_or_render(
+            survey_id,
+            etag,
+            lambda: request.accepted_renderer.render(
+                get_data(), request.accepted_media_type, self.get_renderer_context()
+            ),
+        )
+        return HttpResponse(content, content_type=request.accepted_media_type)
+
+    @action(
+        permission_classes=[permissions.AllowAny],
+        detail=False,
+        throttle_classes=[throttling.SurveyReadThrottle],
+        methods=["GET"],
+        name=_("Get a version of a survey"),
+        url_path=r"versions/(?P<version_hash>[0-9a-f]{64})",
+    )
+    def getVersion(self, request, version_hash=None, *args, **kwargs):
+        """
+        the json of a published version of a survey eg GET /api/v1/Survey/versions/<hash>
+        A version never changes so clients and proxies may keep it forever
+        """
+        survey = (
+            self.filter_queryset(self.get_queryset()).filter(versions__hash=version_hash).first()
+        )
+        if survey is None:
+            return Response({}, status=404)
+        etag = '"%s"' % version_hash
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            version = models.SurveyVersion.objects.get(hash=version_hash)
+            response = Response({"hash": version.hash, "json": version.json})
+        response["ETag"] = etag
+        # shared caches only keep the versions everyone can see
+        visibility = (
+            "public"
+            if get_anonymous_user().has_perm("surveyjs.view_survey", survey)
+            else "private"
+        )
+        patch_cache_control(response, **{visibility: True, "max_age": 31536000, "immutable": True})
+        return response
+
+    def get_etag(self, *parts):
+        """
+        etag of a response built from the parts, the body also depends on the
+        requesting user (nested permissions), the renderer and the restql query
+        """
+        request = self.request
+        return helpers.make_etag(
+            *parts, request.user.id, request.accepted_renderer.format, request.GET.urlencode()
+        )
+
+    def not_modified(self, etag, last_modified=None):
+        """a 304 response if the If-None-Match / If-Modified-Since of the request match, else None"""
+        response = get_conditional_response(
+            self.request,
+            etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+        )
+        return self.set_validators(response, etag, last_modified) if response else None
+
+    def set_validators(self, response, etag, last_modified=None):
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified.timestamp())
+        # the body depends on the user so only the browser keeps it, and asks again every time
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
     @action(
         permission_classes=[permissions.AllowAny],
@@ -99,7 +272,8 @@ class SurveyViewSet(MixinViewSet, viewsets.ModelViewSet):
         if "change_survey" in get_perms(user, survey):
             success = True
             survey.name = survey_name
-            survey.save(update_fields=["name"])
+            # last_updated is the etag of the survey endpoints
+            survey.save(update_fields=["name", "last_updated"])
         data = {"success": success}
         return Response(data)
 
@@ -147,7 +321,7 @@ class SurveyViewSet(MixinViewSet, viewsets.ModelViewSet):
         survey_id = request.GET.get("id", request.data.get("id"))
         survey = models.Survey.objects.get(id=survey_id)
         if "change_survey" in get_perms(user, survey):
-            update_fields = ["json"]
+            update_fields = ["json", "last_updated"]
             if survey_json.get("title"):
                 survey.name = survey_json.get("title")
                 update_fields.append("name")
@@ -163,6 +337,7 @@ class SurveyViewSet(MixinViewSet, viewsets.ModelViewSet):
     @action(
         permission_classes=[permissions.AllowAny],
         detail=False,
+        throttle_classes=[throttling.SurveySubmitThrottle],
         methods=["POST"],
         name=_("Save survey Results"),
         url_path="post",
@@ -174,19 +349,376 @@ class SurveyViewSet(MixinViewSet, viewsets.ModelViewSet):
         user = request.user
         data = request.data.get("surveyResult")
         post_id = request.data.get("postId")
-        survey = models.Survey.objects.get(post_id=post_id)
-        if "submit_survey" in get_perms(user, survey):
-            ser = serializers.ResultSerializer(
-                data={"survey": survey.id, "data": data},
+        submission_id = request.data.get("submissionId")
+        if submission_id and submissions.to_uuid(submission_id) is None:
+            return Response({"submissionId": [_("Must be a valid UUID.")]}, status=400)
+        # answered from the cached snapshot of the survey when warm
+        snapshot = snapshots.get_snapshot(post_id)
+        if snapshot is None:
+            return Response({"postId": [_("Survey not found")]}, status=404)
+        survey = snapshots.get_survey(snapshot)
+        if snapshots.can_submit(snapshot, user):
+            data = validators.normalize_data(data)
+            errors = validators.validate_result(survey, data)
+            if errors:
+                return Response({"data": errors}, status=400)
+            if submission_id:
+                # a retry of a saved submission returns the saved result
+                saved = models.Result.objects.filter(submission_id=submission_id).first()
+                if saved:
+                    return self.replayed_response(saved, survey)
+            # the survey of the snapshot is saved as it is, it is not looked up again
+            ser = serializers.SubmittedResultSerializer(
+                data={"data": data, "submission_id": submission_id},
                 context=self.get_serializer_context(),
             )
             if ser.is_valid():
-                ser.save()
+                if spool.is_enabled():
+                    return self.spool_results(
+                        [(survey, ser.validated_data["data"], ser.validated_data.get("submission_id"))]
+                    )
+                try:
+                    with transaction.atomic():
+                        # the submitter is kept so a retried submission_id is only answered to them
+                        ser.save(survey=survey, user=user if user.is_authenticated else None)
+                except IntegrityError:
+                    # the same submission was saved by another request in the meantime
+                    saved = models.Result.objects.get(submission_id=submission_id)
+                    return self.replayed_response(saved, survey)
                 return Response(ser.data)
             else:
                 return Response(ser.errors)
         return Response({}, status=403)
 
+    def replayed_response(self, saved, survey):
+        """the saved result of a retried submission, 409 if the submission_id is of another survey or submitter"""
+        if not submissions.is_same_submitter(saved, survey, self.request.user):
+            return Response(
+                {"submissionId": [_("This submission id is already used")]}, status=409
+            )
+        return Response(
+            serializers.SubmittedResultSerializer(saved, context=self.get_serializer_context()).data
+        )
+
+    @action(
+        permission_classes=[permissions.AllowAny],
+        detail=False,
+        throttle_classes=[throttling.SurveySubmitThrottle],
+        methods=["POST"],
+        name=_("Save survey Results in bulk"),
+        url_path="post/bulk",
+    )
+    def saveResultsBulk(self, request, *args, **kwargs):
+        """
+        Save many results at once eg {"results": [{"postId": "...", "surveyResult": {...}}, ...]}
+        every survey and its permissions are resolved once per batch and results are
+        inserted in bulk. The response has the status of every item in the same order
+        """
+        user = request.user
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get("results")
+        if not isinstance(items, list):
+            return Response({"detail": _("`results` must be a list")}, status=400)
+        max_results = getattr(settings, "SURVEYJS_BULK_MAX_RESULTS", 1000)
+        if len(items) > max_results:
+            return Response(
+                {"detail": _("A batch can have at most %s results") % max_results},
+                status=413,
+            )
+
+        surveys = submissions.resolve_surveys(
+            [item.get("postId") for item in items if isinstance(item, dict)], user
+        )
+        statuses, to_create = [], []
+        for index, item in enumerate(items):
+            item = item if isinstance(item, dict) else {}
+            survey, can_submit = surveys.get(
+                submissions.to_uuid(item.get("postId")), (None, False)
+            )
+            submission_id = submissions.to_uuid(item.get("submissionId"))
+            status = {"index": index, "postId": item.get("postId"), "success": False}
+            if survey is None:
+                status.update({"status": 404, "errors": {"postId": [_("Survey not found")]}})
+            elif not can_submit:
+                status.update({"status": 403, "errors": {"postId": [_("Permission denied")]}})
+            elif item.get("surveyResult") is None:
+                status.update(
+                    {"status": 400, "errors": {"surveyResult": [_("This field is required.")]}}
+                )
+            elif item.get("submissionId") and submission_id is None:
+                status.update(
+                    {"status": 400, "errors": {"submissionId": [_("Must be a valid UUID.")]}}
+                )
+            else:
+                data = validators.normalize_data(item["surveyResult"])
+                errors = validators.validate_result(survey, data)
+                if errors:
+                    status.update({"status": 400, "errors": {"surveyResult": errors}})
+                else:
+                    to_create.append((status, (survey, data, submission_id)))
+            statuses.append(status)
+
+        if spool.is_enabled() and to_create:
+            # retries of submissions which are already saved are answered now
+            saved = {
+                result.submission_id: result
+                for result in models.Result.objects.filter(
+                    submission_id__in=[args[2] for __, args in to_create if args[2]]
+                ).only("id", "survey_id", "user_id", "submission_id")
+            }
+            for status, args in to_create:
+                if args[2] in saved:
+                    result = saved[args[2]]
+                    if submissions.is_same_submitter(result, args[0], user):
+                        status.update(
+                            {"status": 200, "success": True, "duplicate": True, "id": result.id}
+                        )
+                    else:
+                        status.update(
+                            {"status": 409, "errors": {"submissionId": [_("This submission id is already used")]}}
+                        )
+            to_spool = [(status, args) for status, args in to_create if args[2] not in saved]
+            response = self.spool_results([args for __, args in to_spool])
+            if response.status_code != 202:
+                return response
+            for status, __ in to_spool:
+                status.update({"status": 202, "success": True, "queued": True})
+            return Response(
+                {
+                    "count": len(statuses),
+                    "created": 0,
+                    "queued": len(to_spool),
+                    "failed": len([status for status in statuses if not status["success"]]),
+                    "results": statuses,
+                }
+            )
+
+        results = submissions.create_results([args for __, args in to_create], user=user)
+        failed = len(statuses) - len(results)
+        for (status, args), (result, created) in zip(to_create, results):
+            if not created and not submissions.is_same_submitter(result, args[0], user):
+                status.update(
+                    {"status": 409, "errors": {"submissionId": [_("This submission id is already used")]}}
+                )
+                failed += 1
+                continue
+            status.update({"status": 201 if created else 200, "success": True, "id": result.id})
+            if not created:
+                status["duplicate"] = True
+        return Response(
+            {
+                "count": len(statuses),
+                "created": len([created for __, created in results if created]),
+                "failed": failed,
+                "results": statuses,
+            }
+        )
+
+    def get_draft(self, draft_id):
+        """
+        the draft of the draftId, the token is enough for anonymous drafts.
+        Returns (draft, error response)
+        """
+        token = submissions.to_uuid(draft_id)
+        draft = (
+            models.DraftResult.objects.select_related("survey", "user")
+            .filter(token=token)
+            .first()
+            if token
+            else None
+        )
+        if draft is None:
+            return None, Response({"draftId": [_("Draft not found")]}, status=404)
+        if draft.user_id and draft.user_id != self.request.user.id:
+            return None, Response({}, status=403)
+        return draft, None
+
+    @action(
+        permission_classes=[permissions.AllowAny],
+        detail=False,
+        throttle_classes=[throttling.SurveySubmitThrottle],
+        methods=["GET", "POST"],
+        name=_("Draft survey Results"),
+        url_path="draft",
+    )
+    def draft(self, request, *args, **kwargs):
+        """
+        POST {"postId": "...", "surveyResult": {...}} starts a draft with the answers given so far.
+        GET ?draftId=... returns the draft to resume it
+        """
+        if request.method == "GET":
+            draft, error = self.get_draft(request.GET.get("draftId"))
+            if error:
+                return error
+            return Response(serializers.DraftResultSerializer(draft).data)
+
+        user = request.user
+        survey = get_object_or_404(
+            models.Survey, post_id=submissions.to_uuid(request.data.get("postId"))
+        )
+        if "submit_survey" not in get_perms(user, survey):
+            return Response({}, status=403)
+        data = validators.normalize_data(request.data.get("surveyResult") or {})
+        if not isinstance(data, dict):
+            return Response(
+                {"surveyResult": [_("Must be an object of question: answer.")]}, status=400
+            )
+        draft = models.DraftResult.objects.create(
+            survey=survey, user=user if user.is_authenticated else None, data=data
+        )
+        return Response(serializers.DraftResultSerializer(draft).data, status=201)
+
+    @action(
+        permission_classes=[permissions.AllowAny],
+        detail=False,
+        methods=["POST", "PATCH"],
+        name=_("Autosave draft survey Results"),
+        url_path="draft/patch",
+    )
+    def patchDraft(self, request, *args, **kwargs):
+        """
+        Apply a json patch to a draft eg
+        {"draftId": "...", "version": 3, "patch": [{"op": "add", "path": "/age", "value": 20}]}
+        The version is optional, when given the patch is refused with 409 if the draft
+        was changed since. Only the new version is returned to keep autosaves small
+        """
+        draft, error = self.get_draft(request.data.get("draftId"))
+        if error:
+            return error
+        version = request.data.get("version")
+        if version is not None and (isinstance(version, bool) or not isinstance(version, int)):
+            return Response({"version": [_("Must be an integer.")]}, status=400)
+        try:
+            draft = drafts.patch_draft(draft.token, request.data.get("patch"), version=version)
+        except models.DraftResult.DoesNotExist:
+            return Response({"draftId": [_("Draft not found")]}, status=404)
+        except drafts.DraftConflict as e:
+            return Response({"detail": str(e), "version": e.version}, status=409)
+        except jsonpatch.JsonPatchError as e:
+            return Response({"patch": [str(e)]}, status=400)
+        return Response({"draftId": draft.token, "version": draft.version})
+
+    @action(
+        permission_classes=[permissions.AllowAny],
+        detail=False,
+        throttle_classes=[throttling.SurveySubmitThrottle],
+        methods=["POST"],
+        name=_("Complete draft survey Results"),
+        url_path="draft/complete",
+    )
+    def completeDraft(self, request, *args, **kwargs):
+        """
+        Validate the draft and save it as a result. Completing it again returns the saved result
+        """
+        draft_id = request.data.get("draftId")
+        draft, error = self.get_draft(draft_id)
+        if error:
+            # the draft is deleted once completed
+            saved = models.Result.objects.filter(
+                submission_id=submissions.to_uuid(draft_id)
+            ).first()
+            if saved is None or (saved.user_id and saved.user_id != request.user.id):
+                return error
+            return Response(
+                serializers.ResultSerializer(saved, context=self.get_serializer_context()).data
+            )
+        if "submit_survey" not in get_perms(request.user, draft.survey):
+            return Response({}, status=403)
+        result, created, errors = drafts.complete_draft(draft)
+        if errors:
+            return Response({"data": errors}, status=400)
+        return Response(
+            serializers.ResultSerializer(result, context=self.get_serializer_context()).data,
+            status=201 if created else 200,
+        )
+
+    @action(
+        permission_classes=[permissions.AllowAny],
+        detail=False,
+        methods=["POST"],
+        name=_("Import survey results"),
+        url_path="import",
+    )
+    def importResults(self, request, *args, **kwargs):
+        """
+        Import results from a newline delimited json body, one result per line eg
+        POST /api/v1/Survey/import?postId=...&batchSize=500 with Content-Type: application/x-ndjson
+        The body is read line by line so any size of upload uses the same memory.
+        It can be compressed with Content-Encoding: gzip or zstd
+        """
+        user = request.user
+        survey = get_object_or_404(
+            models.Survey, post_id=submissions.to_uuid(request.GET.get("postId"))
+        )
+        if "change_survey" not in get_perms(user, survey):
+            return Response({}, status=403)
+        batch_size = request.GET.get("batchSize", "")
+        report = importer.import_lines(
+            # the django request is read directly so the body is never parsed in one go
+            parsers.decompress_stream(
+                request._request,
+                request.META.get("HTTP_CONTENT_ENCODING"),
+                max_size=getattr(settings, "MAX_DECOMPRESSED_IMPORT_SIZE", None),
+            ),
+            survey,
+            user=user,
+            batch_size=min(int(batch_size), 5000) if batch_size.isdigit() else 500,
+        )
+        return Response(report)
+
+    def spool_results(self, items, *args, **kwargs):
+        """
+        buffer validated (survey, data, submission_id) items in the spool instead of saving them now
+        """
+        try:
+            spool.append(
+                [
+                    spool.to_record(survey, data, user=self.request.user, submission_id=submission_id)
+                    for survey, data, submission_id in items
+                ]
+            )
+        except spool.SpoolFull:
+            return Response(
+                {"detail": _("Too many submissions, try again later")},
+                status=503,
+                headers={"Retry-After": "30"},
+            )
+        return Response({"success": True, "queued": len(items)}, status=202)
+
+    @action(
+        permission_classes=[permissions.IsAdminUser],
+        detail=False,
+        methods=["GET"],
+        name=_("Submission spool backlog"),
+        url_path="spool",
+    )
+    def spoolStats(self, request, *args, **kwargs):
+        """
+        backlog of the buffered submissions waiting to be saved
+        """
+        if not spool.is_enabled():
+            return Response({"enabled": False})
+        return Response({"enabled": True, **spool.stats()})
+
+    @action(
+        permission_classes=[permissions.AllowAny],
+        detail=False,
+        methods=["GET"],
+        name=_("Survey rate limits"),
+        url_path="throttle",
+    )
+    def throttleStats(self, request, *args, **kwargs):
+        """
+        rate limits of a survey with the requests allowed and throttled eg GET ?postId=...
+        """
+        survey = get_object_or_404(
+            models.Survey, post_id=submissions.to_uuid(request.GET.get("postId"))
+        )
+        if "change_survey" not in get_perms(request.user, survey):
+            return Response({}, status=403)
+        return Response(throttling.survey_stats(survey))
+
     @action(
         permission_classes=[permissions.AllowAny],
         detail=False,
@@ -215,23 +747,160 @@ class SurveyViewSet(MixinViewSet, viewsets.ModelViewSet):
     )
     def viewResults(self, request, *args, **kwargs):
         """
-        View all the survey results
+        View all the survey results.
+        ?page= (with ?size=) returns numbered pages, ?cursor= or ?size= alone returns cursor pages.
+        ?stream=json or ?stream=ndjson streams every result as flat rows
+        eg {"id": 1, "survey": 2, "user": 3, "version": "...", "data": {...}, ...}
+        ?answer.region=north&answer.age__gt=40 keeps the results with these answers
+        ?stream=csv or ?stream=xlsx downloads the results with one column per question
         """
         user = request.user
-        survey_id = request.GET.get("postId")
-        survey = models.Survey.objects.get(post_id=survey_id)
+        snapshot = snapshots.get_snapshot(request.GET.get("postId"))
+        if snapshot is None:
+            return Response({"postId": [_("Survey not found")]}, status=404)
+        survey = snapshots.get_survey(snapshot)
         if "survey_view_result" in get_perms(user, survey):
             qs = get_objects_for_user(user, perms=["surveyjs.view_result"]).filter(
                 survey=survey
             )
-            return Response(
+            qs = answers.filter_results(qs, request.GET, survey_id=survey.id)
+            stream = request.GET.get("stream")
+            if stream in ["csv", "xlsx"]:
+                return self.export_results(survey, qs.order_by("id"), stream)
+            if stream in ["json", "ndjson"]:
+                rows = exports.iter_results(qs.order_by("id"))
+                if stream == "json":
+                    return StreamingHttpResponse(
+                        exports.stream_json(rows), content_type="application/json"
+                    )
+                return StreamingHttpResponse(
+                    exports.stream_ndjson(rows), content_type="application/x-ndjson"
+                )
+            if "page" in request.GET:
+                paginator = pagination.CustomPagination()
+            elif "cursor" in request.GET or "size" in request.GET:
+                paginator = pagination.CursorPagination()
+            else:
+                return Response(
+                    serializers.ResultSerializer(
+                        qs, many=True, context=self.get_serializer_context()
+                    ).data
+                )
+            page = paginator.paginate_queryset(
+                qs.select_related("user").order_by("id"), request, view=self
+            )
+            for result in page:
+                # the survey of every result is loaded once
+                result.survey = survey
+            return paginator.get_paginated_response(
                 serializers.ResultSerializer(
-                    qs, many=True, context=self.get_serializer_context()
+                    page, many=True, context=self.get_serializer_context()
                 ).data
             )
         return Response({}, status=403)
 
 
+    def export_results(self, survey, qs, file_type):
+        """the results as a csv or xlsx download, one column per question of the survey"""
+        columns = exports.get_columns(survey.json)
+        table = exports.iter_table(exports.iter_results(qs), columns)
+        filename = "results-%s.%s" % (survey.post_id, file_type)
+        if file_type == "csv":
+            response = StreamingHttpResponse(
+                exports.stream_csv(table, columns), content_type="text/csv; charset=utf-8"
+            )
+            response["Content-Disposition"] = 'attachment; filename="%s"' % filename
+            return response
+        if exports.openpyxl is None:
+            return Response({"stream": [_("xlsx exports need the openpyxl package")]}, status=501)
+        # the workbook is written to disk first, it is zipped so it cannot be sent while written
+        file = tempfile.TemporaryFile()
+        exports.write_xlsx(table, columns, file)
+        file.seek(0)
+        return FileResponse(
+            file,
+            as_attachment=True,
+            filename=filename,
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+
+    @action(
+        permission_classes=[permissions.AllowAny],
+        detail=False,
+        methods=["GET"],
+        name=_("Aggregate Survey results"),
+        url_path="results/aggregates",
+    )
+    def aggregateResults(self, request, *args, **kwargs):
+        """
+        Per question aggregates of the survey results, computed by the database
+        eg {"total": 10, "questions": [{"name": "age", "type": "text", "answered": 8, "skipped": 2, "min": 18, "max": 70, "mean": 41.5}, ...]}
+        """
+        user = request.user
+        snapshot = snapshots.get_snapshot(request.GET.get("postId"))
+        if snapshot is None:
+            return Response({"postId": [_("Survey not found")]}, status=404)
+        survey = snapshots.get_survey(snapshot)
+        if "survey_view_result" in get_perms(user, survey):
+            qs = get_objects_for_user(user, perms=["surveyjs.view_result"]).filter(
+                survey=survey
+            )
+            return Response(aggregates.aggregate(survey, qs))
+        return Response({}, status=403)
+
+    @action(
+        permission_classes=[permissions.AllowAny],
+        detail=False,
+        methods=["GET"],
+        name=_("Pivot Survey results"),
+        url_path="results/pivot",
+    )
+    def pivotResults(self, request, *args, **kwargs):
+        """
+        Cross tab of the answers of questions, eg ?rows=region&columns=gender or ?rows=region,district&columns=gender
+        ?normalize=rows or ?normalize=columns gives the percentages of each row or column, of the total by default
+        """
+        rows = [name for name in request.GET.get("rows", "").split(",") if name]
+        columns = [name for name in request.GET.get("columns", "").split(",") if name]
+        if not rows or not columns:
+            return Response({"rows": [_("Give the questions of the rows and of the columns")]}, status=400)
+        if len(rows) + len(columns) > 3 or len(set(rows + columns)) < len(rows + columns):
+            return Response({"rows": [_("Give up to 3 different questions")]}, status=400)
+        snapshot = snapshots.get_snapshot(request.GET.get("postId"))
+        if snapshot is None:
+            return Response({"postId": [_("Survey not found")]}, status=404)
+        survey = snapshots.get_survey(snapshot)
+        if "survey_view_result" in get_perms(request.user, survey):
+            qs = get_objects_for_user(request.user, perms=["surveyjs.view_result"]).filter(
+                survey=survey
+            )
+            qs = answers.filter_results(qs, request.GET, survey_id=survey.id)
+            return Response(
+                aggregates.pivot(qs, rows, columns, normalize=request.GET.get("normalize", "all"))
+            )
+        return Response({}, status=403)
+
+    @action(
+        permission_classes=[permissions.AllowAny],
+        detail=False,
+        methods=["GET"],
+        name=_("Survey results summary"),
+        url_path="results/summary",
+    )
+    def resultsSummary(self, request, *args, **kwargs):
+        """
+        The answer counts of the survey kept up to date as results are saved,
+        read without scanning the results. Same form as results/aggregates without min and max
+        """
+        snapshot = snapshots.get_snapshot(request.GET.get("postId"))
+        if snapshot is None:
+            return Response({"postId": [_("Survey not found")]}, status=404)
+        survey = snapshots.get_survey(snapshot)
+        if "survey_view_result" in get_perms(request.user, survey):
+            return Response(summaries.get_summary(survey))
+        return Response({}, status=403)
+
+
 class ResultViewSet(MixinViewSet, viewsets.ModelViewSet):
     """ViewSet for the Result class"""
 
@@ -241,3 +910,9 @@ class ResultViewSet(MixinViewSet, viewsets.ModelViewSet):
         "id",
         "survey__id",
     ]
+
+    def extra_queryset(self, queryset):
+        """?answer.<question>[__<operator>]= filters on the answers, see answers.py"""
+        return answers.filter_results(
+            queryset, self.request.GET, survey_id=self.request.GET.get("survey__id")
+        )
@@ -0,0 +1,90 @@
+"""
+Coalesce new submission notifications into one digest per survey and admin.
+
+With settings.BACKGROUND_JOBS a digest is sent by the worker once its window is over.
+Without a worker nothing can wait for the window: a digest is sent by the first submission
+to its survey after the window, and the last ones by `python manage.py send_submission_digests`,
+to be run every minute or so eg by cron
+"""
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from core.utils import helpers, jobs
+from . import models
+
+User = get_user_model()
+
+
+def record_submissions(results):
+    """
+    add the new results to the open digest of their survey.
+    The first result of a window opens a digest and queues it to be sent
+    after settings.SUBMISSION_DIGEST_WINDOW seconds
+    """
+    window = getattr(settings, "SUBMISSION_DIGEST_WINDOW", 60)
+    background = getattr(settings, "BACKGROUND_JOBS", False)
+    for survey_id, count in Counter(result.survey_id for result in results).items():
+        digests = models.SubmissionDigest.objects.filter(survey_id=survey_id, is_sent=False)
+        if not background:
+            # a digest past its window is sent below and a new one is opened
+            digests = digests.filter(created__gt=timezone.now() - timedelta(seconds=window))
+        updated = digests.update(count=F("count") + count, last_updated=timezone.now())
+        if not updated:
+            if not background:
+                send_due_digests(survey_id)
+            digest = models.SubmissionDigest.objects.create(survey_id=survey_id, count=count)
+            if not background:
+                # enqueue would send it straight away
+                continue
+            jobs.enqueue(
+                "surveyjs.digests.send_digest",
+                run_after=timezone.now() + timedelta(seconds=window),
+                digest_id=digest.id,
+            )
+
+
+def send_digest(digest_id):
+    """notify every admin once about all the submissions counted in the digest"""
+    with transaction.atomic():
+        digest = (
+            models.SubmissionDigest.objects.select_for_update()
+            .filter(id=digest_id, is_sent=False)
+            .first()
+        )
+        if digest is None:
+            return
+        digest.is_sent = True
+        digest.save(update_fields=["is_sent", "last_updated"])
+        survey = digest.survey
+        body = (
+            "%s new submissions on %s" % (digest.count, survey)
+            if digest.count > 1
+            else "1 new submission on %s" % survey
+        )
+        helpers.bulk_notify_users(
+            users=User.objects.filter(is_superuser=True),
+            title="New Submission",
+            body=body,
+            target=survey,
+            next_screen="Dashboard",
+            count=digest.count,
+        )
+
+
+def send_due_digests(survey_id=None):
+    """send the digests whose window is over, of every survey or of @survey_id, returns how many were sent"""
+    window = getattr(settings, "SUBMISSION_DIGEST_WINDOW", 60)
+    digest_ids = models.SubmissionDigest.objects.filter(
+        is_sent=False, created__lte=timezone.now() - timedelta(seconds=window)
+    ).values_list("id", flat=True)
+    if survey_id:
+        digest_ids = digest_ids.filter(survey_id=survey_id)
+    sent = 0
+    for digest_id in list(digest_ids):
+        send_digest(digest_id)
+        sent += 1
+    return sent
@@ -0,0 +1,65 @@
+"""
+Autosaved drafts of results.
+
+A draft is created with the answers given so far, then every page change sends a
+json patch (RFC 6902) eg [{"op": "add", "path": "/age", "value": 20}] instead of the
+whole result. Completing the draft validates it and saves it as a Result whose
+submission_id is the draft token, so a retried completion is saved once.
+"""
+import json
+from django.conf import settings
+from django.db import transaction
+from core.utils import jsonpatch
+from . import models
+from . import submissions
+from . import validators
+
+
+class DraftConflict(Exception):
+    """the draft was patched by another request since the version the client has"""
+
+    def __init__(self, version):
+        super().__init__("The draft is at version %s" % version)
+        self.version = version
+
+
+def patch_draft(token, operations, version=None):
+    """
+    apply the json patch to the draft and increment its version.
+    @version the version the patch was made against, DraftConflict is raised if the draft moved on
+    Raises models.DraftResult.DoesNotExist, DraftConflict and jsonpatch.JsonPatchError
+    """
+    max_operations = getattr(settings, "SURVEYJS_DRAFT_MAX_OPERATIONS", 1000)
+    if isinstance(operations, list) and len(operations) > max_operations:
+        raise jsonpatch.JsonPatchError("A patch can have at most %s operations" % max_operations)
+    with transaction.atomic():
+        draft = models.DraftResult.objects.select_for_update().get(token=token)
+        if version is not None and version != draft.version:
+            raise DraftConflict(draft.version)
+        # nothing is saved if an operation fails half way
+        data = jsonpatch.apply_patch(draft.data, operations)
+        if not isinstance(data, dict):
+            raise jsonpatch.JsonPatchError("A draft must stay an object of question: answer")
+        max_size = getattr(settings, "SURVEYJS_MAX_RESULT_SIZE", None)
+        if max_size and len(json.dumps(data)) > max_size:
+            raise jsonpatch.JsonPatchError("The draft is larger than %s bytes" % max_size)
+        draft.data = data
+        draft.version += 1
+        draft.save(update_fields=["data", "version", "last_updated"])
+    return draft
+
+
+def complete_draft(draft):
+    """
+    validate the draft and save it as a result, the draft is deleted once saved
+    returns (result, created, errors), result is None if the draft is not valid
+    """
+    errors = validators.validate_result(draft.survey, draft.data)
+    if errors:
+        return None, False, errors
+    with transaction.atomic():
+        ((result, created),) = submissions.create_results(
+            [(draft.survey, draft.data, draft.token)], user=draft.user
+        )
+        draft.delete()
+    return result, created, {}
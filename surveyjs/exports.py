@@ -0,0 +1,131 @@
+"""
+Streamed exports of survey results.
+
+Rows are read with a server side cursor (queryset.iterator) and written out as they
+come, so the memory used and the time to the first byte do not grow with the number of results.
+CSV and XLSX exports have one column per question of the survey, in the order of the survey json.
+XLSX needs the optional openpyxl package, its rows go to a temporary file in write only mode
+"""
+import csv
+import json
+from datetime import date, datetime
+from uuid import UUID
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from . import aggregates
+
+try:
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+except ImportError:
+    openpyxl = None
+
+RESULT_FIELDS = ["id", "survey_id", "user_id", "version_id", "submission_id", "created", "last_updated", "data"]
+# the columns of a table export before the questions
+META_COLUMNS = ["id", "user", "version", "submission_id", "created", "last_updated"]
+# a csv cell starting with one of these is run as a formula by spreadsheets
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def iter_results(qs, chunk_size=None):
+    """the results as flat dicts eg {"id": 1, "survey": 2, "user": 3, "data": {...}, ...}"""
+    chunk_size = chunk_size or getattr(settings, "SURVEYJS_STREAM_CHUNK_SIZE", 2000)
+    for row in qs.values(*RESULT_FIELDS).iterator(chunk_size=chunk_size):
+        yield {
+            "id": row["id"],
+            "survey": row["survey_id"],
+            "user": row["user_id"],
+            "version": row["version_id"],
+            "submission_id": row["submission_id"],
+            "created": row["created"],
+            "last_updated": row["last_updated"],
+            "data": row["data"],
+        }
+
+
+def stream_json(rows):
+    """a json array written one row at a time"""
+    # sent before the first query so the client gets a byte straight away
+    yield "["
+    separator = ""
+    for row in rows:
+        yield separator + json.dumps(row, cls=DjangoJSONEncoder)
+        separator = ","
+    yield "]"
+
+
+def stream_ndjson(rows):
+    """newline delimited json, one row per line"""
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+def get_columns(survey_json):
+    """the columns of a table export eg ["id", "user", ..., "name", "age", "region"]"""
+    return META_COLUMNS + [question["name"] for question in aggregates.get_questions(survey_json)]
+
+
+def escape_formula(value):
+    """a text answer as text in csv, "=1+1" becomes "'=1+1" """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def to_cell(value):
+    """a value as one cell, lists and objects as json"""
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, cls=DjangoJSONEncoder)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def iter_table(rows, columns):
+    """the rows of iter_results flattened to one cell per column"""
+    questions = columns[len(META_COLUMNS):]
+    for row in rows:
+        data = row["data"] if isinstance(row["data"], dict) else {}
+        yield [to_cell(row[column]) for column in META_COLUMNS] + [
+            to_cell(data.get(question)) for question in questions
+        ]
+
+
+class Echo:
+    """a file which gives back what is written, for csv.writer in a generator"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(table, columns):
+    writer = csv.writer(Echo())
+    # a byte order mark so excel opens the file as utf-8
+    yield "\ufeff" + writer.writerow([escape_formula(column) for column in columns])
+    for row in table:
+        yield writer.writerow([escape_formula(cell) for cell in row])
+
+
+def write_xlsx(table, columns, file):
+    """write the table to @file as xlsx, only a row at a time is kept in memory"""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Results")
+
+    def to_xlsx_cell(value):
+        if not isinstance(value, str):
+            return value
+        # control characters are not allowed in xlsx
+        cell = WriteOnlyCell(sheet, ILLEGAL_CHARACTERS_RE.sub("", value))
+        # typed as text so "=1+1" is never a formula
+        cell.data_type = "s"
+        return cell
+
+    sheet.append([to_xlsx_cell(column) for column in columns])
+    for row in table:
+        sheet.append([to_xlsx_cell(cell) for cell in row])
+    workbook.save(file)
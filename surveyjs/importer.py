@@ -0,0 +1,77 @@
+"""
+Streaming import of newline delimited json (ndjson) results into a survey
+"""
+import json
+import time
+from . import models
+from . import submissions
+from . import validators
+
+MAX_REPORTED_ERRORS = 100
+
+
+def parse_line(line):
+    """
+    a line is either the result data eg {"name": "a"} or an object with the
+    submission fields eg {"surveyResult": {"name": "a"}, "submissionId": "..."}
+    returns (data, submission_id)
+    """
+    item = json.loads(line)
+    if not isinstance(item, dict):
+        raise ValueError("Each line must be a json object")
+    if "surveyResult" in item:
+        submission_id = item.get("submissionId")
+        if submission_id and submissions.to_uuid(submission_id) is None:
+            raise ValueError("submissionId must be a valid UUID")
+        return item["surveyResult"], submissions.to_uuid(submission_id)
+    return item, None
+
+
+def import_lines(lines, survey, user=None, batch_size=500):
+    """
+    save the results of an iterable of ndjson lines (str or bytes) into the survey.
+    Every line is checked with the compiled validator of the survey.
+    At most one batch of results is held in memory whatever the size of the input
+    returns a report eg {"lines": 10, "created": 9, "duplicates": 0, "failed": 1, "errors": [...], "seconds": 0.1, "per_second": 100.0}
+    """
+    if user is not None and not user.is_authenticated:
+        user = None
+    report = {"lines": 0, "created": 0, "duplicates": 0, "failed": 0, "errors": []}
+    started = time.monotonic()
+    batch = []
+
+    def save_batch():
+        for saved, result in zip(submissions.insert_results(batch), batch):
+            if saved is result:
+                report["created"] += 1
+            else:
+                report["duplicates"] += 1
+        batch.clear()
+
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        report["lines"] += 1
+        try:
+            data, submission_id = parse_line(line)
+            errors = validators.validate_result(survey, data)
+            if errors:
+                raise ValueError(json.dumps(errors))
+        except ValueError as e:
+            report["failed"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"line": number, "error": str(e)})
+            continue
+        batch.append(
+            models.Result(survey=survey, user=user, data=data, submission_id=submission_id)
+        )
+        if len(batch) >= batch_size:
+            save_batch()
+    if batch:
+        save_batch()
+
+    report["seconds"] = round(time.monotonic() - started, 3)
+    report["per_second"] = (
+        round(report["lines"] / report["seconds"], 1) if report["seconds"] else report["lines"]
+    )
+    return report
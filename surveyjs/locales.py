@@ -0,0 +1,110 @@
+"""
+One language of a multilingual survey json.
+
+Localizable strings are objects of locale: text eg {"default": "Name", "fr": "Nom", "sw": "Jina"}.
+They are collapsed to the text of the chosen locale, falling back to its base language
+(fr for fr-ca) then to the default text. The sliced json is cached per version and locale
+"""
+import re
+from django.conf import settings
+from django.conf.locale import LANG_INFO
+from django.core.cache import cache
+from django.utils.translation.trans_real import parse_accept_lang_header
+
+DEFAULT = "default"
+# a language code eg sw, fr-ca, zh-hans
+LOCALE_RE = re.compile(r"^[a-z]{2,3}(-[a-z0-9]{2,8})*$", re.IGNORECASE)
+
+
+def is_locale(key):
+    return key == DEFAULT or bool(LOCALE_RE.match(key))
+
+
+def is_localized(value):
+    """
+    a localizable string, its keys are locales. Any language code is a locale next to the default text
+    (rw, am, so... are not known by django), without it only the ones django knows eg {"fr": "Nom"}
+    so objects like {"url": "..."} are left alone
+    """
+    return (
+        isinstance(value, dict)
+        and bool(value)
+        and all(isinstance(text, str) for text in value.values())
+        and all(is_locale(key) for key in value)
+        and (DEFAULT in value or all(key in LANG_INFO for key in value))
+    )
+
+
+def get_locales(value, locales=None):
+    """every locale with a translation somewhere in the json"""
+    locales = set() if locales is None else locales
+    if is_localized(value):
+        locales.update(key for key in value if key != DEFAULT)
+    elif isinstance(value, dict):
+        for item in value.values():
+            get_locales(item, locales)
+    elif isinstance(value, list):
+        for item in value:
+            get_locales(item, locales)
+    return locales
+
+
+def choose_locale(survey_json, available, requested=None, accept_language=None):
+    """
+    the locale to show, None for the default texts.
+    @requested the ?locale= of the request, else the languages of the Accept-Language header are tried in order
+    """
+    own_locale = survey_json.get("locale") if isinstance(survey_json, dict) else None
+    if requested:
+        candidates = [requested.lower()]
+    else:
+        candidates = [code for code, __ in parse_accept_lang_header(accept_language or "")]
+    for code in candidates:
+        for locale in [code, code.split("-")[0]]:
+            if locale == own_locale:
+                # the default texts are in this language
+                return None
+            if locale in available:
+                return locale
+    return None
+
+
+def slice_locale(value, locale):
+    if is_localized(value):
+        base = locale.split("-")[0] if locale else None
+        for key in [locale, base, DEFAULT]:
+            if key and key in value:
+                return value[key]
+        return next(iter(value.values()))
+    if isinstance(value, dict):
+        return {key: slice_locale(item, locale) for key, item in value.items()}
+    if isinstance(value, list):
+        return [slice_locale(item, locale) for item in value]
+    return value
+
+
+def get_localized_json(survey, survey_json, variant="runtime", requested=None, accept_language=None):
+    """
+    survey_json (the full or runtime json of the survey) in one language,
+    unchanged if the survey has a single language
+    """
+    timeout = getattr(settings, "SURVEYJS_RUNTIME_CACHE_TIMEOUT", 86400)
+    version = survey.version_id
+    available = cache.get("survey_locales:%s" % version) if version else None
+    if available is None:
+        available = get_locales(survey_json)
+        if version:
+            cache.set("survey_locales:%s" % version, available, timeout)
+    if not available:
+        return survey_json
+    locale = choose_locale(survey_json, available, requested, accept_language)
+    key = "survey_localized:%s:%s:%s" % (version, variant, locale or DEFAULT)
+    localized = cache.get(key) if version else None
+    if localized is None:
+        localized = slice_locale(survey_json, locale)
+        if locale and isinstance(localized, dict):
+            # the runner shows its own buttons and messages in this language too
+            localized["locale"] = locale
+        if version:
+            cache.set(key, localized, timeout)
+    return localized
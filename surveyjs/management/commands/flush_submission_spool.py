@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from surveyjs import spool
+
+
+class Command(BaseCommand):
+    help = "Save the results buffered in SUBMISSION_SPOOL_DIR into the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Flush once and exit")
+        parser.add_argument("--batch", type=int, default=1000, help="Results per insert")
+        parser.add_argument("--sleep", type=float, default=1, help="Seconds between flushes")
+        parser.add_argument("--stats", action="store_true", help="Print the backlog and exit")
+
+    def handle(self, *args, **options):
+        if not spool.is_enabled():
+            raise CommandError("SUBMISSION_SPOOL_DIR is not set")
+
+        if options["stats"]:
+            for key, value in spool.stats().items():
+                self.stdout.write(f"{key}: {value}")
+            return
+
+        while True:
+            started = time.monotonic()
+            saved = spool.flush(batch_size=options["batch"])
+            if saved:
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"{saved} results saved in {elapsed:.2f}s")
+            if options["once"]:
+                break
+            time.sleep(options["sleep"])
@@ -0,0 +1,38 @@
+import sys
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from surveyjs import importer, models, submissions
+
+
+class Command(BaseCommand):
+    help = "Import survey results from a newline delimited json file, one result per line"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The ndjson file, - to read from stdin")
+        parser.add_argument("--survey", required=True, help="post_id or id of the survey")
+        parser.add_argument("--batch-size", type=int, default=500, help="Results per insert")
+        parser.add_argument("--user", help="username saved as the submitter of the results")
+
+    def handle(self, *args, **options):
+        survey_key = options["survey"]
+        if submissions.to_uuid(survey_key):
+            survey = models.Survey.objects.filter(post_id=survey_key).first()
+        else:
+            survey = models.Survey.objects.filter(id=survey_key).first() if survey_key.isdigit() else None
+        if survey is None:
+            raise CommandError(f"Survey {survey_key} not found")
+        user = None
+        if options["user"]:
+            user = get_user_model().objects.filter(username=options["user"]).first()
+            if user is None:
+                raise CommandError(f"User {options['user']} not found")
+
+        stream = sys.stdin.buffer if options["path"] == "-" else open(options["path"], "rb")
+        with stream:
+            report = importer.import_lines(
+                stream, survey, user=user, batch_size=options["batch_size"]
+            )
+        for error in report.pop("errors"):
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        for key, value in report.items():
+            self.stdout.write(f"{key}: {value}")
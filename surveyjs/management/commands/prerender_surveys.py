@@ -0,0 +1,32 @@
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from surveyjs import models, prerender
+
+
+class Command(BaseCommand):
+    help = "Write the public surveys as precompressed json files for nginx or a CDN"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", help="Output directory, defaults to settings.SURVEYJS_PRERENDER_DIR")
+        parser.add_argument("--survey", help="post_id of a single survey to write again")
+
+    def handle(self, *args, **options):
+        directory = None
+        if options["dir"]:
+            directory = Path(options["dir"])
+            directory.mkdir(parents=True, exist_ok=True)
+        if prerender.brotli is None:
+            self.stderr.write("brotli is not installed, only gzip files are written")
+        if options["survey"]:
+            survey = prerender.get_public_surveys().filter(post_id=options["survey"]).first()
+            if survey is None:
+                if not models.Survey.objects.filter(post_id=options["survey"]).exists():
+                    raise CommandError(f"Survey {options['survey']} not found")
+                prerender.remove_survey(options["survey"], directory)
+                self.stdout.write("removed: 1")
+                return
+            written = prerender.write_survey(survey, directory)
+            self.stdout.write(f"written: {int(written)}")
+            return
+        for key, value in prerender.prerender_all(directory).items():
+            self.stdout.write(f"{key}: {value}")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from surveyjs import answers, models
+
+
+class Command(BaseCommand):
+    help = "Write the typed answers of the results to the Answer table again, for results saved before it existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--survey", help="post_id of a single survey")
+
+    def handle(self, *args, **options):
+        surveys = models.Survey.objects.all()
+        if options["survey"]:
+            surveys = surveys.filter(post_id=options["survey"])
+            if not surveys.exists():
+                raise CommandError(f"Survey {options['survey']} not found")
+        total = 0
+        for survey in surveys.order_by("id").iterator():
+            total += answers.rebuild(survey)
+        self.stdout.write(f"indexed: {total}")
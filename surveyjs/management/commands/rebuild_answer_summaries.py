@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from surveyjs import models, summaries
+
+
+class Command(BaseCommand):
+    help = "Count the answers of the surveys again from their results, or check the counts with --check"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--survey", help="post_id of a single survey")
+        parser.add_argument("--check", action="store_true", help="Only report the wrong counts")
+
+    def handle(self, *args, **options):
+        surveys = models.Survey.objects.all()
+        if options["survey"]:
+            surveys = surveys.filter(post_id=options["survey"])
+            if not surveys.exists():
+                raise CommandError(f"Survey {options['survey']} not found")
+        wrong_surveys = 0
+        for survey in surveys.order_by("id").iterator():
+            wrong = summaries.rebuild(survey, check=options["check"])
+            if wrong:
+                wrong_surveys += 1
+                self.stdout.write(f"{survey.post_id}: {len(wrong)} wrong counts")
+                for question, value, saved, counted in wrong[:20]:
+                    self.stdout.write(f"  {question or '(results)'}={value or '(answered)'}: {saved} instead of {counted}")
+        action = "wrong" if options["check"] else "rebuilt"
+        self.stdout.write(f"{action}: {wrong_surveys}")
+        if options["check"] and wrong_surveys:
+            raise CommandError("Some answer summaries are wrong, run the command without --check to rebuild them")
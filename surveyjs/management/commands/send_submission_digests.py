@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from surveyjs import digests
+
+
+class Command(BaseCommand):
+    help = "Send the new submission digests whose window is over, for setups without BACKGROUND_JOBS"
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"sent: {digests.send_due_digests()}")
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("surveyjs", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SubmissionDigest",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("is_sent", models.BooleanField(default=False)),
+                ("last_updated", models.DateTimeField(auto_now=True)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "survey",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="surveyjs.survey",
+                    ),
+                ),
+            ],
+        ),
+    ]
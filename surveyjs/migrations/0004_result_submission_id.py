@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("surveyjs", "0003_spoolsegment"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="result",
+            name="submission_id",
+            field=models.UUIDField(
+                blank=True,
+                help_text="Generated by the client so retried submissions are saved once",
+                null=True,
+                unique=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:56
+
+import core.utils.throttling
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("surveyjs", "0005_draftresult"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="survey",
+            name="rate_limit",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Submissions allowed eg 1000/min, empty for the default rate",
+                max_length=32,
+                validators=[core.utils.throttling.validate_rate],
+            ),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+import hashlib
+import json
+
+
+def publish_surveys(apps, schema_editor):
+    """the current json of every survey becomes its first version"""
+    Survey = apps.get_model("surveyjs", "Survey")
+    SurveyVersion = apps.get_model("surveyjs", "SurveyVersion")
+    for survey in Survey.objects.iterator():
+        canonical = json.dumps(
+            survey.json, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+        )
+        version_hash = hashlib.sha256(canonical.encode()).hexdigest()
+        version, __ = SurveyVersion.objects.get_or_create(
+            hash=version_hash, defaults={"json": survey.json}
+        )
+        version.surveys.add(survey)
+        Survey.objects.filter(pk=survey.pk).update(version=version_hash)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("surveyjs", "0006_survey_rate_limit"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SurveyVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hash", models.CharField(editable=False, max_length=64, unique=True)),
+                ("json", models.JSONField(default=dict, editable=False)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "surveys",
+                    models.ManyToManyField(
+                        help_text="The surveys which published this json",
+                        related_name="versions",
+                        to="surveyjs.survey",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="result",
+            name="version",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="The version of the survey the result was filled against",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                to="surveyjs.surveyversion",
+                to_field="hash",
+            ),
+        ),
+        migrations.AddField(
+            model_name="survey",
+            name="version",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                help_text="The published version of the json",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="surveyjs.surveyversion",
+                to_field="hash",
+            ),
+        ),
+        migrations.RunPython(publish_surveys, migrations.RunPython.noop),
+    ]
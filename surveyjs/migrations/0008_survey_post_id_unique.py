@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:01
+
+from django.db import migrations, models
+import uuid
+
+
+def check_duplicates(apps, schema_editor):
+    """refuse to migrate while two surveys share a post_id, the clients of both would break"""
+    Survey = apps.get_model("surveyjs", "Survey")
+    duplicates = (
+        Survey.objects.values("post_id")
+        .annotate(count=models.Count("id"))
+        .filter(count__gt=1)
+        .values_list("post_id", flat=True)
+    )
+    if duplicates:
+        surveys = Survey.objects.filter(post_id__in=list(duplicates)).order_by("post_id", "id")
+        raise RuntimeError(
+            "Surveys share a post_id, give all but one of each a new post_id and migrate again: %s"
+            % ", ".join("%s (survey %s)" % (survey.post_id, survey.id) for survey in surveys)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("surveyjs", "0007_surveyversion"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="survey",
+            name="post_id",
+            field=models.UUIDField(blank=True, default=uuid.uuid4, unique=True),
+        ),
+    ]
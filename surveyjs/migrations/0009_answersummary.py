@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("surveyjs", "0008_survey_post_id_unique"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnswerSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("question", models.CharField(blank=True, max_length=255)),
+                ("value", models.CharField(blank=True, max_length=255)),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "number_count",
+                    models.IntegerField(
+                        default=0,
+                        help_text='Answers which are numbers, counted on the value "" row',
+                    ),
+                ),
+                (
+                    "number_sum",
+                    models.FloatField(
+                        default=0,
+                        help_text="Sum of the answers which are numbers, for the mean",
+                    ),
+                ),
+                ("last_updated", models.DateTimeField(auto_now=True)),
+                (
+                    "survey",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="surveyjs.survey",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("survey", "question", "value")},
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("surveyjs", "0009_answersummary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Answer",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("question", models.CharField(max_length=255)),
+                (
+                    "text_value",
+                    models.CharField(
+                        blank=True,
+                        help_text="The answer as text, numbers and booleans as json",
+                        max_length=255,
+                        null=True,
+                    ),
+                ),
+                (
+                    "number_value",
+                    models.FloatField(
+                        blank=True, help_text="The answer if it is a number", null=True
+                    ),
+                ),
+                (
+                    "result",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="answers",
+                        to="surveyjs.result",
+                    ),
+                ),
+                (
+                    "survey",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="surveyjs.survey",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["survey", "question", "text_value"],
+                        name="surveyjs_an_survey__9c2c50_idx",
+                    ),
+                    models.Index(
+                        fields=["survey", "question", "number_value"],
+                        name="surveyjs_an_survey__2deaa2_idx",
+                    ),
+                    models.Index(
+                        fields=["question", "text_value"],
+                        name="surveyjs_an_questio_715d46_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
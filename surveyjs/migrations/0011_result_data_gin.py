@@ -0,0 +1,36 @@
+from django.db import migrations
+
+INDEX = "surveyjs_result_data_gin"
+
+
+def create_index(apps, schema_editor):
+    """
+    a GIN index of Result.data for the json containment (@>) of the answer filters, postgres only.
+    Other databases have no json index, their answer filters on a path read every result of the survey
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    # built without locking the results table against new submissions
+    schema_editor.execute(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS %s ON surveyjs_result USING gin (data jsonb_path_ops)"
+        % INDEX
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX CONCURRENTLY IF EXISTS %s" % INDEX)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ("surveyjs", "0010_answer"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
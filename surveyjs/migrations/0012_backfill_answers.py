@@ -0,0 +1,48 @@
+from django.db import migrations
+
+CHUNK_SIZE = 2000
+
+
+def index_answers(apps, schema_editor):
+    """the Answer rows of the results saved before the Answer table, the answer filters only read that table"""
+    from surveyjs import aggregates
+    from surveyjs import answers
+
+    Answer = apps.get_model("surveyjs", "Answer")
+    Result = apps.get_model("surveyjs", "Result")
+    Survey = apps.get_model("surveyjs", "Survey")
+    SurveyVersion = apps.get_model("surveyjs", "SurveyVersion")
+    questions = {}
+
+    def get_questions(result):
+        key = result.version_id or "survey:%s" % result.survey_id
+        if key not in questions:
+            if result.version_id:
+                survey_json = SurveyVersion.objects.filter(hash=result.version_id).values_list("json", flat=True).first()
+            else:
+                survey_json = Survey.objects.filter(id=result.survey_id).values_list("json", flat=True).first()
+            questions[key] = aggregates.get_questions(survey_json)
+        return questions[key]
+
+    # results indexed since the Answer table exists are left alone
+    results = Result.objects.exclude(id__in=Answer.objects.values("result_id")).only(
+        "id", "survey_id", "version_id", "data"
+    )
+    rows = []
+    for result in results.iterator(chunk_size=CHUNK_SIZE):
+        rows += answers.get_answers(result, get_questions(result), Answer)
+        if len(rows) >= CHUNK_SIZE:
+            Answer.objects.bulk_create(rows)
+            rows = []
+    Answer.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("surveyjs", "0011_result_data_gin"),
+    ]
+
+    operations = [
+        migrations.RunPython(index_answers, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.urls import reverse
 from uuid import uuid4
 from django.conf import settings
+from core.utils.throttling import validate_rate
 
 
 class Attachment(models.Model):
@@ -30,11 +31,13 @@ class Survey(models.Model):
 
     # Fields
     created = models.DateTimeField(auto_now_add=True, editable=False)
-    post_id = models.UUIDField(blank=True, default=uuid4)
+    post_id = models.UUIDField(blank=True, default=uuid4, unique=True)
     last_updated = models.DateTimeField(auto_now=True, editable=False)
     json = models.JSONField(default=dict, blank=True)
     name = models.CharField(max_length=255, default=uuid4, blank=True)
     is_active = models.BooleanField(default=True, blank=True)
+    version = models.ForeignKey("surveyjs.SurveyVersion", to_field="hash", on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name="+", help_text='The published version of the json')
+    rate_limit = models.CharField(max_length=32, blank=True, default="", validators=[validate_rate], help_text='Submissions allowed eg 1000/min, empty for the default rate')
 
     class Meta:
         permissions = (("submit_survey", "Can submit survey"),("survey_view_result", "Can view survey results"),)
@@ -49,21 +52,170 @@ class Survey(models.Model):
 
 
 
+class SurveyVersion(models.Model):
+    """
+    A published survey json, stored once and never changed. The hash is the sha256
+    of the canonical json so the same definition always gets the same version
+    """
+
+    # Relationships
+    surveys = models.ManyToManyField("surveyjs.Survey", related_name="versions", help_text='The surveys which published this json')
+
+    # Fields
+    hash = models.CharField(max_length=64, unique=True, editable=False)
+    json = models.JSONField(default=dict, editable=False)
+    created = models.DateTimeField(auto_now_add=True, editable=False)
+
+    class Meta:
+        pass
+
+    def __str__(self):
+        return str(self.hash)
+
+
+
 class Result(models.Model):
 
     # Relationships
     survey = models.ForeignKey("surveyjs.Survey", on_delete=models.CASCADE)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, help_text='The person who submitted the survey if submitted while logged in')
 
+    version = models.ForeignKey("surveyjs.SurveyVersion", to_field="hash", on_delete=models.PROTECT, null=True, blank=True, help_text='The version of the survey the result was filled against')
+
     # Fields
     data = models.JSONField(default=dict, blank=True)
+    submission_id = models.UUIDField(unique=True, null=True, blank=True, help_text='Generated by the client so retried submissions are saved once')
     last_updated = models.DateTimeField(auto_now=True, editable=False)
     created = models.DateTimeField(auto_now_add=True, editable=False)
 
     class Meta:
         pass
 
+    def save(self, *args, **kwargs):
+        if self.version_id is None and self.survey_id:
+            self.version_id = self.survey.version_id
+        return super().save(*args, **kwargs)
+
     def __str__(self):
         return str(self.data)[:10]
 
 
+
+
+
+class SubmissionDigest(models.Model):
+    """
+    Counts the new results of a survey until the digest notification is sent to the admins
+    """
+
+    # Relationships
+    survey = models.ForeignKey("surveyjs.Survey", on_delete=models.CASCADE)
+
+    # Fields
+    count = models.PositiveIntegerField(default=0)
+    is_sent = models.BooleanField(default=False)
+    last_updated = models.DateTimeField(auto_now=True, editable=False)
+    created = models.DateTimeField(auto_now_add=True, editable=False)
+
+    class Meta:
+        pass
+
+    def __str__(self):
+        return f"{self.count} new submissions on {self.survey_id}"
+
+
+
+class SpoolSegment(models.Model):
+    """
+    A spool segment whose results are saved. Written in the same transaction as the
+    results so a segment is never replayed twice if the flusher dies before deleting it
+    """
+
+    # Fields
+    name = models.CharField(max_length=255, unique=True)
+    count = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True, editable=False)
+
+    class Meta:
+        pass
+
+    def __str__(self):
+        return str(self.name)
+
+
+
+class DraftResult(models.Model):
+    """
+    A result still being filled in. The client saves its progress with json patches
+    and the draft becomes a Result once completed
+    """
+
+    # Relationships
+    survey = models.ForeignKey("surveyjs.Survey", on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, help_text='The person filling in the survey if logged in')
+
+    # Fields
+    token = models.UUIDField(unique=True, default=uuid4, editable=False, help_text='Given to the client to patch and complete the draft, also the submission id of the result')
+    data = models.JSONField(default=dict, blank=True)
+    version = models.PositiveIntegerField(default=0, help_text='Incremented by every patch so concurrent autosaves are detected')
+    last_updated = models.DateTimeField(auto_now=True, editable=False)
+    created = models.DateTimeField(auto_now_add=True, editable=False)
+
+    class Meta:
+        pass
+
+    def __str__(self):
+        return str(self.token)
+
+
+
+class AnswerSummary(models.Model):
+    """
+    The number of results of a survey giving an answer to a question, kept up to date
+    as results are saved and deleted. The row of value "" counts the results answering
+    the question, the row of question "" and value "" counts all the results
+    """
+
+    # Relationships
+    survey = models.ForeignKey("surveyjs.Survey", on_delete=models.CASCADE)
+
+    # Fields
+    question = models.CharField(max_length=255, blank=True)
+    value = models.CharField(max_length=255, blank=True)
+    count = models.IntegerField(default=0)
+    number_count = models.IntegerField(default=0, help_text='Answers which are numbers, counted on the value "" row')
+    number_sum = models.FloatField(default=0, help_text='Sum of the answers which are numbers, for the mean')
+    last_updated = models.DateTimeField(auto_now=True, editable=False)
+
+    class Meta:
+        unique_together = [("survey", "question", "value")]
+
+    def __str__(self):
+        return f"{self.question}={self.value}: {self.count}"
+
+
+
+class Answer(models.Model):
+    """
+    One answer of a result, typed and indexed so results are filtered by answer without
+    decoding Result.data. A question with several answers (checkbox) has one row per answer
+    """
+
+    # Relationships
+    result = models.ForeignKey("surveyjs.Result", on_delete=models.CASCADE, related_name="answers")
+    survey = models.ForeignKey("surveyjs.Survey", on_delete=models.CASCADE, related_name="+")
+
+    # Fields
+    question = models.CharField(max_length=255)
+    text_value = models.CharField(max_length=255, null=True, blank=True, help_text='The answer as text, numbers and booleans as json')
+    number_value = models.FloatField(null=True, blank=True, help_text='The answer if it is a number')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["survey", "question", "text_value"]),
+            models.Index(fields=["survey", "question", "number_value"]),
+            models.Index(fields=["question", "text_value"]),
+        ]
+
+    def __str__(self):
+        return f"{self.question}={self.text_value}"
@@ -0,0 +1,50 @@
+"""
+Cache of the rendered bodies of the survey read endpoints.
+
+A body is cached under the etag of the response (survey, last_updated, user, renderer
+and restql query) plus a generation token of the survey. The Survey signals replace the
+token so every cached body of a survey is dropped at once, including after writes
+which do not touch last_updated
+"""
+from uuid import uuid4
+from django.conf import settings
+from django.core.cache import cache
+
+ALL_SURVEYS = "all"
+
+
+def get_generation(survey_id=ALL_SURVEYS):
+    key = "survey_generation:%s" % survey_id
+    generation = cache.get(key)
+    if generation is None:
+        # a generation evicted from the cache starts a new one, never an old one
+        cache.add(key, uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate(survey_id):
+    """drop the cached bodies of the survey and of the survey lists"""
+    cache.set_many(
+        {
+            "survey_generation:%s" % survey_id: uuid4().hex,
+            "survey_generation:%s" % ALL_SURVEYS: uuid4().hex,
+        },
+        None,
+    )
+
+
+def get_or_render(survey_id, etag, render):
+    """
+    the cached bytes of the body, render() gives the bytes when they are not cached
+    @survey_id the survey of the body or ALL_SURVEYS for a list
+    """
+    timeout = getattr(settings, "SURVEYJS_PAYLOAD_CACHE_TIMEOUT", 3600)
+    if not timeout:
+        return render()
+    key = "survey_payload:%s:%s:%s" % (survey_id, get_generation(survey_id), etag.strip('"'))
+    content = cache.get(key)
+    if content is None:
+        content = render()
+        cache.set(key, content, timeout)
+    return content
@@ -0,0 +1,125 @@
+"""
+Prerendered survey definitions for nginx or a CDN.
+
+Every active survey which anonymous users may view is written to
+<settings.SURVEYJS_PRERENDER_DIR>/<post_id>.json with .json.gz and .json.br next to it,
+so a web server with gzip_static / brotli_static serves survey loads without django.
+Brotli needs the brotli package of the requirements.
+`python manage.py prerender_surveys` writes them all, with settings.SURVEYJS_PRERENDER_ON_SAVE
+a survey is written again by the job queue every time it changes
+"""
+import gzip
+import json
+import os
+from pathlib import Path
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from guardian.shortcuts import get_objects_for_user
+from guardian.utils import get_anonymous_user
+from . import models
+from . import submissions
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+EXTENSIONS = [".json", ".json.gz", ".json.br"]
+
+
+def get_dir():
+    path = Path(
+        getattr(settings, "SURVEYJS_PRERENDER_DIR", None)
+        or os.path.join(settings.STATIC_ROOT, "surveys")
+    )
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def get_public_surveys():
+    """the active surveys anonymous users may view, the only ones written to files"""
+    return get_objects_for_user(
+        get_anonymous_user(),
+        "surveyjs.view_survey",
+        klass=models.Survey.objects.filter(is_active=True),
+        accept_global_perms=False,
+    )
+
+
+def render(survey):
+    """the public definition of the survey as compact json bytes"""
+    return json.dumps(
+        {
+            "id": survey.id,
+            "postId": survey.post_id,
+            "name": survey.name,
+            "version": survey.version_id,
+            "last_updated": survey.last_updated,
+            "json": survey.json,
+        },
+        cls=DjangoJSONEncoder,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    ).encode()
+
+
+def write_file(path, content):
+    # replaced in one step so a reader never sees half a file
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(content)
+    os.replace(tmp, path)
+
+
+def write_survey(survey, directory=None):
+    """write the files of the survey, returns False if they were already up to date"""
+    directory = directory or get_dir()
+    content = render(survey)
+    path = directory / ("%s.json" % survey.post_id)
+    # unchanged files keep their mtime, and the etag the CDN made of it
+    if path.exists() and path.read_bytes() == content:
+        return False
+    files = {".json.gz": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        files[".json.br"] = brotli.compress(content, quality=11)
+    for extension, compressed in files.items():
+        write_file(directory / ("%s%s" % (survey.post_id, extension)), compressed)
+    # the plain file goes last as it marks the files as up to date
+    write_file(path, content)
+    return True
+
+
+def remove_survey(post_id, directory=None):
+    directory = directory or get_dir()
+    for extension in EXTENSIONS:
+        (directory / ("%s%s" % (post_id, extension))).unlink(missing_ok=True)
+
+
+def refresh_survey(survey_id):
+    """write or remove the files of one survey after it changed, run by the job queue"""
+    survey = get_public_surveys().filter(id=survey_id).first()
+    if survey is not None:
+        write_survey(survey)
+        return
+    post_id = models.Survey.objects.filter(id=survey_id).values_list("post_id", flat=True).first()
+    if post_id:
+        remove_survey(post_id)
+
+
+def prerender_all(directory=None):
+    """
+    write every public survey and remove the files of the others
+    returns {"written": 2, "unchanged": 10, "removed": 1}
+    """
+    directory = directory or get_dir()
+    report = {"written": 0, "unchanged": 0, "removed": 0}
+    post_ids = set()
+    for survey in get_public_surveys().iterator():
+        post_ids.add(str(survey.post_id))
+        report["written" if write_survey(survey, directory) else "unchanged"] += 1
+    for path in directory.glob("*.json"):
+        # the directory can be STATIC_ROOT, files not named after a post_id are not ours
+        post_id = submissions.to_uuid(path.stem)
+        if post_id is not None and str(post_id) == path.stem and path.stem not in post_ids:
+            remove_survey(path.stem, directory)
+            report["removed"] += 1
+    return report
@@ -0,0 +1,85 @@
+"""
+The runtime form of a survey json, what the respondent runner needs and nothing else.
+
+The Creator saves editor metadata, properties set to their default value and
+verbose forms of strings and choices. They are dropped or shortened here, properties
+holding data (defaultValue, triggers...) are left as they are:
+{"default": "Name"} becomes "Name", {"value": "a", "text": "a"} becomes "a".
+The runtime json only depends on the survey json so it is cached per version hash
+"""
+from django.conf import settings
+from django.core.cache import cache
+from . import locales
+
+# properties whose value is the default of the runner
+DEFAULT_VALUES = {
+    "visible": True,
+    "isRequired": False,
+    "readOnly": False,
+    "startWithNewLine": True,
+    "hideNumber": False,
+    "titleLocation": "default",
+    "descriptionLocation": "default",
+    "choicesOrder": "none",
+    "inputType": "text",
+    "indent": 0,
+    "description": "",
+    "validators": [],
+}
+# properties holding answers or values to set, they are kept exactly as saved
+DATA_KEYS = {
+    "defaultValue",
+    "correctAnswer",
+    "value",
+    "valueTrue",
+    "valueFalse",
+    "setValue",
+    "triggers",
+    "calculatedValues",
+    "defaultRowValue",
+    "defaultPanelValue",
+}
+
+
+def is_editor_key(key):
+    """metadata of the editor eg $schema, __tempId"""
+    return key.startswith("$") or key.startswith("__") or key in getattr(
+        settings, "SURVEYJS_EDITOR_ONLY_KEYS", []
+    )
+
+
+def minify(value, in_list=False):
+    if isinstance(value, list):
+        return [minify(item, in_list=True) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if locales.is_localized(value):
+        # a localizable string with the default locale only is the text itself,
+        # the texts of other locales are kept as they are, empty ones included
+        return value["default"] if list(value) == ["default"] else value
+    result = {}
+    for key, item in value.items():
+        if is_editor_key(key):
+            continue
+        default = DEFAULT_VALUES.get(key)
+        # True == 1 in python so the types are compared too
+        if key in DEFAULT_VALUES and item == default and type(item) is type(default):
+            continue
+        result[key] = item if key in DATA_KEYS else minify(item)
+    # an item of choices, rows or columns whose text is its value
+    if in_list and set(result) == {"value", "text"} and result["text"] == result["value"]:
+        if isinstance(result["value"], str):
+            return result["value"]
+    return result
+
+
+def get_runtime_json(survey):
+    """the runtime json of the survey, cached per version"""
+    if not survey.version_id:
+        return minify(survey.json)
+    key = "survey_runtime:%s" % survey.version_id
+    runtime_json = cache.get(key)
+    if runtime_json is None:
+        runtime_json = minify(survey.json)
+        cache.set(key, runtime_json, getattr(settings, "SURVEYJS_RUNTIME_CACHE_TIMEOUT", 86400))
+    return runtime_json
@@ -35,6 +35,7 @@ class SurveySerializer(DynamicFieldsMixin, NestedModelSerializer):
         update_ops=["add", "create", "remove", "update"],
     )
     postId = serializers.CharField(source='post_id', required=False)
+    version = serializers.CharField(source='version_id', read_only=True)
     class Meta:
         model = models.Survey
         fields = [
@@ -44,10 +45,19 @@ class SurveySerializer(DynamicFieldsMixin, NestedModelSerializer):
             "post_id",
             "postId",
             "json",
+            "version",
             "name",
             "is_active",
+            "rate_limit",
             "user",
         ]
+        # set by staff in the admin, an owner could otherwise lift the limit of their own survey
+        read_only_fields = ["rate_limit"]
+
+class SurveyListingSerializer(SurveySerializer):
+    """a survey without its json, for listings"""
+    class Meta(SurveySerializer.Meta):
+        fields = [field for field in SurveySerializer.Meta.fields if field != "json"]
 
 class ResultSerializer(DynamicFieldsMixin, NestedModelSerializer):
     user = NestedField(
@@ -65,6 +75,7 @@ class ResultSerializer(DynamicFieldsMixin, NestedModelSerializer):
         create_ops=["create"],
         update_ops=["add", "create", "remove", "update"],
     )
+    version = serializers.CharField(source='version_id', read_only=True)
     class Meta:
         model = models.Result
         fields = [
@@ -72,6 +83,29 @@ class ResultSerializer(DynamicFieldsMixin, NestedModelSerializer):
             "last_updated",
             "created",
             "data",
+            "submission_id",
+            "version",
             "survey",
             "user",
         ]
+
+class SubmittedResultSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """a result as answered to its submitter, its survey and user are ids so nothing more is loaded"""
+    version = serializers.CharField(source='version_id', read_only=True)
+    class Meta:
+        model = models.Result
+        fields = ResultSerializer.Meta.fields
+        read_only_fields = ["survey", "user"]
+
+class DraftResultSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    draftId = serializers.UUIDField(source='token', read_only=True)
+    class Meta:
+        model = models.DraftResult
+        fields = [
+            "draftId",
+            "version",
+            "data",
+            "survey",
+            "last_updated",
+            "created",
+        ]
@@ -1,9 +1,19 @@
 
 from . import models
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from core.utils import helpers
+from django.contrib.contenttypes.models import ContentType
+from guardian.models import GroupObjectPermission, UserObjectPermission
+from core.utils import helpers, jobs
+from . import digests
+from . import payloads
+from . import prerender
+from . import snapshots
+from . import summaries
+from . import throttling
+from . import versions
 User = get_user_model()
 
 
@@ -11,21 +21,118 @@ User = get_user_model()
 def Survey_post_save(sender, **kwargs):
     """ """
     item, created = kwargs["instance"], kwargs["created"]
+    update_fields = kwargs.get("update_fields")
     if created:
         helpers.handle_group_permissions(item)
+    else:
+        throttling.forget_rate_limit(item.post_id, item.id)
+    if created or not update_fields or "json" in update_fields:
+        versions.publish(item)
+    payloads.invalidate(item.id)
+    snapshots.forget(item.post_id)
+    if getattr(settings, "SURVEYJS_PRERENDER_ON_SAVE", False):
+        jobs.enqueue("surveyjs.prerender.refresh_survey", survey_id=item.id)
+
+
+@receiver(pre_delete, sender=models.Survey)
+def Survey_pre_delete(sender, **kwargs):
+    """the summary of the survey is deleted with it, its results are not taken out one by one"""
+    summaries.deleting_surveys.add(kwargs["instance"].id)
+
+
+@receiver(post_delete, sender=models.Survey)
+def Survey_post_delete(sender, **kwargs):
+    """ """
+    summaries.deleting_surveys.discard(kwargs["instance"].id)
+    payloads.invalidate(kwargs["instance"].id)
+    snapshots.forget(kwargs["instance"].post_id)
+    if getattr(settings, "SURVEYJS_PRERENDER_ON_SAVE", False):
+        prerender.remove_survey(kwargs["instance"].post_id)
+
+
+@receiver(post_save, sender=UserObjectPermission)
+@receiver(post_save, sender=GroupObjectPermission)
+@receiver(post_delete, sender=UserObjectPermission)
+@receiver(post_delete, sender=GroupObjectPermission)
+def ObjectPermission_changed(sender, **kwargs):
+    """the permissions in the snapshot of a survey changed"""
+    item = kwargs["instance"]
+    if item.content_type_id == ContentType.objects.get_for_model(models.Survey).id:
+        post_id = (
+            models.Survey.objects.filter(pk=item.object_pk)
+            .values_list("post_id", flat=True)
+            .first()
+        )
+        if post_id:
+            snapshots.forget(post_id)
+            # the survey may have become public or private
+            if getattr(settings, "SURVEYJS_PRERENDER_ON_SAVE", False):
+                jobs.enqueue("surveyjs.prerender.refresh_survey", survey_id=int(item.object_pk))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def User_groups_changed(sender, **kwargs):
+    """ """
+    if kwargs["action"] in ["post_add", "post_remove", "post_clear", "pre_clear"]:
+        if kwargs["reverse"]:
+            # the users of a group changed
+            user_ids = kwargs["pk_set"] or User.objects.filter(groups=kwargs["instance"]).values_list("id", flat=True)
+        else:
+            user_ids = [kwargs["instance"].pk]
+        snapshots.forget_user_groups(user_ids)
+
+@receiver(pre_save, sender=models.Result)
+def Result_pre_save(sender, **kwargs):
+    """the answers before the update, taken out of the summary once it is saved"""
+    item, update_fields = kwargs["instance"], kwargs.get("update_fields")
+    item._summary_data = None
+    if item.pk and (not update_fields or "data" in update_fields):
+        item._summary_data = (
+            models.Result.objects.filter(pk=item.pk).values_list("data", flat=True).first()
+        )
+
 
 @receiver(post_save, sender=models.Result)
 def Result_post_save(sender, **kwargs):
     """ """
     item, created = kwargs["instance"], kwargs["created"]
-    if created or True:
-        helpers.handle_group_permissions(item)
-        helpers.notify_users(
-            users=User.objects.filter(is_superuser=True),
-            title="New Submission",
-            data={"next_screen": "Dashboard"},
-            body="Submission with id %s created at %s" % (item.id, item.created),
+    data_changed = created or getattr(item, "_summary_data", None) is not None
+    if data_changed:
+        jobs.enqueue(
+            "surveyjs.summaries.count_data",
+            survey_id=item.survey_id,
+            version_id=item.version_id,
+            data=item.data,
+            old_data=None if created else item._summary_data,
         )
+        jobs.enqueue("surveyjs.answers.index_result", result_id=item.id, created=created)
+    jobs.enqueue("surveyjs.signals.on_result_saved", result_id=item.id, created=created)
+
+
+@receiver(post_delete, sender=models.Result)
+def Result_post_delete(sender, **kwargs):
+    """ """
+    item = kwargs["instance"]
+    if item.survey_id in summaries.deleting_surveys:
+        return
+    jobs.enqueue(
+        "surveyjs.summaries.count_data",
+        survey_id=item.survey_id,
+        version_id=item.version_id,
+        data=item.data,
+        sign=-1,
+    )
+
+
+def on_result_saved(result_id, created=True):
+    """permissions and notifications of a saved result, run by the job queue"""
+    item = models.Result.objects.filter(id=result_id).first()
+    if item is None:
+        return
+    helpers.handle_group_permissions(item)
+    if created:
+        digests.record_submissions([item])
+
 
 @receiver(post_save, sender=models.Attachment)
 def Attachment_post_save(sender, **kwargs):
@@ -0,0 +1,117 @@
+"""
+Cached resolution of a survey post_id on the submit and results paths.
+
+A snapshot of a survey holds its id, active flag, last_updated, version and the
+users and groups allowed to submit it. It is kept for a few seconds in the process
+and for longer in the shared cache (CACHES in the settings), and the Survey and guardian
+permission signals drop it from both, other processes keep their copy at most
+SURVEYJS_SNAPSHOT_LOCAL_TTL seconds. A warm submission then checks the survey and the
+permission and saves the result without looking the survey up
+"""
+import functools
+import time
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from guardian.models import GroupObjectPermission, UserObjectPermission
+from guardian.utils import get_anonymous_user
+from . import models
+from . import submissions
+
+SNAPSHOT_FIELDS = ["id", "post_id", "is_active", "last_updated", "version_id"]
+# per process, entries live settings.SURVEYJS_SNAPSHOT_LOCAL_TTL seconds
+_local = {}
+
+
+def get_key(post_id):
+    return "survey_snapshot:%s" % post_id
+
+
+def build_snapshot(post_id):
+    survey = models.Survey.objects.filter(post_id=post_id).values(*SNAPSHOT_FIELDS).first()
+    if survey is None:
+        return None
+    permissions = {
+        "content_type": ContentType.objects.get_for_model(models.Survey),
+        "object_pk": str(survey["id"]),
+        "permission__codename": "submit_survey",
+    }
+    survey["users"] = list(
+        UserObjectPermission.objects.filter(**permissions).values_list("user_id", flat=True)
+    )
+    survey["groups"] = list(
+        GroupObjectPermission.objects.filter(**permissions).values_list("group_id", flat=True)
+    )
+    return survey
+
+
+def get_snapshot(post_id):
+    """the snapshot of the survey eg {"id": 1, "is_active": True, "users": [2], "groups": [1], ...}, None if not found"""
+    post_id = submissions.to_uuid(post_id)
+    if post_id is None:
+        return None
+    key = get_key(post_id)
+    local = _local.get(key)
+    if local and local[0] > time.monotonic():
+        return local[1]
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_snapshot(post_id)
+        if snapshot is None:
+            return None
+        cache.set(key, snapshot, getattr(settings, "SURVEYJS_SNAPSHOT_TIMEOUT", 300))
+    if len(_local) >= 10000:
+        _local.clear()
+    _local[key] = (time.monotonic() + getattr(settings, "SURVEYJS_SNAPSHOT_LOCAL_TTL", 5), snapshot)
+    return snapshot
+
+
+def forget(post_id):
+    """drop the snapshot of a survey from the shared cache and from this process"""
+    key = get_key(post_id)
+    cache.delete(key)
+    _local.pop(key, None)
+
+
+@functools.lru_cache(maxsize=None)
+def get_field_names():
+    """SNAPSHOT_FIELDS in the order of the model fields, the order from_db takes the values in"""
+    return [field.attname for field in models.Survey._meta.concrete_fields if field.attname in SNAPSHOT_FIELDS]
+
+
+def get_survey(snapshot):
+    """
+    a Survey of the snapshot without a query, the other fields
+    (json, name...) are loaded only if they are read
+    """
+    field_names = get_field_names()
+    return models.Survey.from_db(None, field_names, [snapshot[field] for field in field_names])
+
+
+def get_user_groups(user):
+    """
+    (user id, group ids) of a user, the guardian anonymous user for anonymous requests,
+    kept in the cache until the groups of the user change
+    """
+    key = "user_groups:%s" % (user.id if user.is_authenticated else "anonymous")
+    identity = cache.get(key)
+    if identity is None:
+        if not user.is_authenticated:
+            user = get_anonymous_user()
+        identity = (user.id, list(user.groups.values_list("id", flat=True)))
+        cache.set(key, identity, getattr(settings, "SURVEYJS_SNAPSHOT_TIMEOUT", 300))
+    return identity
+
+
+def forget_user_groups(user_ids):
+    cache.delete_many(["user_groups:%s" % user_id for user_id in user_ids] + ["user_groups:anonymous"])
+
+
+def can_submit(snapshot, user):
+    """the submit_survey check of guardian, answered from the snapshot"""
+    if user.is_authenticated and not user.is_active:
+        return False
+    if user.is_authenticated and user.is_superuser:
+        return True
+    user_id, group_ids = get_user_groups(user)
+    return user_id in snapshot["users"] or bool(set(group_ids) & set(snapshot["groups"]))
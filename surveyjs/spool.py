@@ -0,0 +1,201 @@
+"""
+Write buffered ingestion of survey results.
+
+When settings.SUBMISSION_SPOOL_DIR is set, validated submissions are appended as
+json lines to a local spool and acknowledged straight away.
+`python manage.py flush_submission_spool` seals the active file into a segment and
+saves every segment into surveyjs.Result with bulk inserts, one transaction per segment.
+A SpoolSegment row is written in that transaction, so a segment left on disk by a
+crash is deleted instead of being saved again.
+"""
+import json
+import os
+import time
+from pathlib import Path
+from uuid import uuid4
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from . import models
+from . import submissions
+
+ACTIVE_NAME = "active.ndjson"
+SEGMENT_PATTERN = "segment-*.ndjson"
+User = get_user_model()
+
+
+class SpoolFull(Exception):
+    """the flusher is behind and the spool reached settings.SUBMISSION_SPOOL_MAX_BYTES"""
+
+
+def is_enabled():
+    return bool(getattr(settings, "SUBMISSION_SPOOL_DIR", None))
+
+
+def get_dir():
+    path = Path(settings.SUBMISSION_SPOOL_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def stats():
+    """
+    backlog of the spool eg {"segments": 2, "pending_bytes": 5120, "active_bytes": 1024, "oldest_age": 3.5}
+    """
+    spool_dir = get_dir()
+    segments = sorted(spool_dir.glob(SEGMENT_PATTERN))
+    active = spool_dir / ACTIVE_NAME
+    active_bytes = active.stat().st_size if active.exists() else 0
+    ages = [time.time() - path.stat().st_mtime for path in segments]
+    if active_bytes:
+        ages.append(time.time() - active.stat().st_ctime)
+    return {
+        "segments": len(segments),
+        "pending_bytes": sum(path.stat().st_size for path in segments) + active_bytes,
+        "active_bytes": active_bytes,
+        "oldest_age": max(ages) if ages else 0,
+    }
+
+
+def to_record(survey, data, user=None, submission_id=None):
+    return {
+        "survey": survey.id,
+        "version": survey.version_id,
+        "user": user.id if user is not None and user.is_authenticated else None,
+        "data": data,
+        "submission_id": submission_id,
+        "received": timezone.now(),
+    }
+
+
+def append(records):
+    """
+    append the records to the active file with one locked write.
+    Raises SpoolFull when the backlog is over settings.SUBMISSION_SPOOL_MAX_BYTES
+    """
+    if not records:
+        return
+    max_bytes = getattr(settings, "SUBMISSION_SPOOL_MAX_BYTES", None)
+    if max_bytes and stats()["pending_bytes"] >= max_bytes:
+        raise SpoolFull()
+
+    # posix only, imported here so the api loads on windows without the spool
+    import fcntl
+
+    payload = b"".join(
+        json.dumps(record, cls=DjangoJSONEncoder).encode() + b"\n" for record in records
+    )
+    path = get_dir() / ACTIVE_NAME
+    while True:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            # the file may have been sealed by the flusher between open and lock
+            try:
+                is_active = os.fstat(fd).st_ino == os.stat(path).st_ino
+            except FileNotFoundError:
+                is_active = False
+            if not is_active:
+                continue
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+            if getattr(settings, "SUBMISSION_SPOOL_FSYNC", True):
+                os.fsync(fd)
+            return
+        finally:
+            # closing also releases the lock
+            os.close(fd)
+
+
+def seal():
+    """turn the active file into a segment so writers start a new one"""
+    import fcntl
+
+    path = get_dir() / ACTIVE_NAME
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            is_active = os.fstat(fd).st_ino == os.stat(path).st_ino
+        except FileNotFoundError:
+            is_active = False
+        if not is_active or not os.fstat(fd).st_size:
+            return None
+        segment = path.with_name(f"segment-{time.time_ns():020d}-{uuid4().hex[:8]}.ndjson")
+        os.rename(path, segment)
+        return segment
+    finally:
+        os.close(fd)
+
+
+def read_segment(segment):
+    """records of a segment. A torn last line left by a crash while writing is skipped"""
+    records = []
+    with open(segment, "rb") as stream:
+        for line in stream:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def flush_segment(segment, batch_size=1000):
+    """save the results of a segment, returns the number of results saved"""
+    saved = 0
+    with transaction.atomic():
+        if not models.SpoolSegment.objects.filter(name=segment.name).exists():
+            records = read_segment(segment)
+            survey_ids = set(
+                models.Survey.objects.filter(
+                    id__in={record["survey"] for record in records}
+                ).values_list("id", flat=True)
+            )
+            user_ids = set(
+                User.objects.filter(
+                    id__in={record.get("user") for record in records if record.get("user")}
+                ).values_list("id", flat=True)
+            )
+            # results of surveys deleted in the meantime are dropped, of users deleted are kept anonymous
+            results = [
+                models.Result(
+                    survey_id=record["survey"],
+                    version_id=record.get("version"),
+                    user_id=record.get("user") if record.get("user") in user_ids else None,
+                    data=record.get("data"),
+                    submission_id=submissions.to_uuid(record.get("submission_id")),
+                )
+                for record in records
+                if record.get("survey") in survey_ids
+            ]
+            for start in range(0, len(results), batch_size):
+                batch = results[start : start + batch_size]
+                # retried submissions are saved once
+                saved += len(
+                    [
+                        saved_result
+                        for saved_result, result in zip(submissions.insert_results(batch), batch)
+                        if saved_result is result
+                    ]
+                )
+            models.SpoolSegment.objects.create(name=segment.name, count=saved)
+    segment.unlink(missing_ok=True)
+    models.SpoolSegment.objects.filter(name=segment.name).delete()
+    return saved
+
+
+def flush(batch_size=1000):
+    """seal the active file and save every pending segment, oldest first"""
+    seal()
+    saved = 0
+    for segment in sorted(get_dir().glob(SEGMENT_PATTERN)):
+        saved += flush_segment(segment, batch_size=batch_size)
+    return saved
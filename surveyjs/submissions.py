@@ -0,0 +1,127 @@
+"""
+Helpers shared by the endpoints which create survey results
+"""
+from uuid import UUID
+from django.db import IntegrityError, transaction
+from guardian.core import ObjectPermissionChecker
+from core.utils import helpers, jobs
+from . import answers
+from . import digests
+from . import models
+from . import summaries
+
+
+def to_uuid(value):
+    """return a UUID or None if the value is not a valid uuid"""
+    try:
+        return value if isinstance(value, UUID) else UUID(str(value))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def is_same_submitter(result, survey, user):
+    """
+    a saved result returned for a retried submission_id must be of the same survey and
+    submitter, else anyone knowing the id could read the answers of another respondent
+    """
+    user_id = user.id if user is not None and user.is_authenticated else None
+    return result.survey_id == survey.id and result.user_id == user_id
+
+
+def resolve_surveys(post_ids, user):
+    """
+    fetch all the surveys of a batch with one query and check the
+    submit_survey permission once per survey
+    returns {post_id(UUID): (survey, can_submit)}
+    """
+    uuids = {to_uuid(post_id) for post_id in post_ids} - {None}
+    surveys = list(models.Survey.objects.filter(post_id__in=uuids))
+    checker = ObjectPermissionChecker(user)
+    if surveys:
+        checker.prefetch_perms(surveys)
+    return {
+        survey.post_id: (survey, checker.has_perm("submit_survey", survey))
+        for survey in surveys
+    }
+
+
+def on_results_created(result_ids):
+    """
+    the side effects normally done by Result_post_save, once for a whole batch.
+    Run by the job queue
+    """
+    results = list(models.Result.objects.filter(id__in=result_ids).order_by("id"))
+    # results sharing a survey and user resolve to the same permission groups
+    helpers.handle_group_permissions_bulk(
+        results, key=lambda result: (result.survey_id, result.user_id)
+    )
+    digests.record_submissions(results)
+    summaries.count_results(results)
+    answers.index_results(results, created=True)
+
+
+def insert_results(results, retry=True):
+    """
+    insert unsaved results in bulk and queue their side effects as one job.
+    A result whose submission_id is already saved, or repeated in the batch, is not
+    inserted again and the saved result is returned in its place
+    returns the saved results in the same order
+    """
+    if not results:
+        return []
+    # results are tied to the current version of their survey
+    survey_ids = {result.survey_id for result in results if result.version_id is None}
+    if survey_ids:
+        current = dict(
+            models.Survey.objects.filter(id__in=survey_ids).values_list("id", "version_id")
+        )
+        for result in results:
+            if result.version_id is None:
+                result.version_id = current.get(result.survey_id)
+    submission_ids = [result.submission_id for result in results if result.submission_id]
+    saved = {
+        result.submission_id: result
+        for result in models.Result.objects.filter(submission_id__in=submission_ids)
+    } if submission_ids else {}
+    new_results = []
+    for result in results:
+        if result.submission_id:
+            if result.submission_id in saved:
+                continue
+            saved[result.submission_id] = result
+        new_results.append(result)
+
+    try:
+        with transaction.atomic():
+            models.Result.objects.bulk_create(new_results)
+            if new_results:
+                jobs.enqueue(
+                    "surveyjs.submissions.on_results_created",
+                    result_ids=[result.id for result in new_results],
+                )
+    except IntegrityError:
+        if not retry:
+            raise
+        # a retry of the same submission was saved by another request in the meantime
+        for result in new_results:
+            result.pk = None
+        return insert_results(results, retry=False)
+    return [saved.get(result.submission_id, result) for result in results]
+
+
+def create_results(items, user=None):
+    """
+    insert results in bulk and queue their side effects as one job
+    @items list of (survey, data, submission_id)
+    returns a list of (result, created) in the same order, created is False for
+    a submission_id which was already saved
+    """
+    if user is not None and not user.is_authenticated:
+        user = None
+    results = [
+        models.Result(survey=survey, user=user, data=data, submission_id=submission_id)
+        for survey, data, submission_id in items
+    ]
+    return [
+        (saved, saved is result) for saved, result in zip(insert_results(results), results)
+    ]
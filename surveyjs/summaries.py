@@ -0,0 +1,212 @@
+"""
+Answer counts of a survey kept in the AnswerSummary table.
+
+Every saved or deleted result adds or removes its answers from the counts, so a dashboard
+reads one row per answer instead of scanning the results. A result is counted with the
+questions of its own version, which never changes, so removing it takes back exactly
+what was added. Single saves and deletes are counted by jobs queued by the Result signals
+(deletes of a whole survey are not, its summary goes with it), bulk inserts by the on_results_created job. `python manage.py rebuild_answer_summaries` counts them again
+from the results, for backfills and to check the counts
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from . import aggregates
+from . import models
+from .validators import is_number
+
+# question of the row counting every result, value of the rows counting the answers of a question
+TOTAL = ""
+ANSWERED = ""
+_questions = {}
+# surveys being deleted, the deletes of their results are not counted
+deleting_surveys = set()
+
+
+def get_questions(survey_id, version_id):
+    """the questions a result of this survey version is counted with"""
+    key = version_id or "survey:%s" % survey_id
+    if key not in _questions:
+        if version_id:
+            survey_json = models.SurveyVersion.objects.filter(hash=version_id).values_list("json", flat=True).first()
+        else:
+            survey_json = models.Survey.objects.filter(id=survey_id).values_list("json", flat=True).first()
+        if len(_questions) >= getattr(settings, "SURVEYJS_VALIDATOR_CACHE_SIZE", 1000):
+            _questions.clear()
+        questions = aggregates.get_questions(survey_json)
+        if not version_id:
+            # the json of a survey without a version can still change
+            return questions
+        _questions[key] = questions
+    return _questions[key]
+
+
+def get_counts(data, questions):
+    """what one result adds to the summary {(question, value): [count, number_count, number_sum]}"""
+    counts = {(TOTAL, ANSWERED): [1, 0, 0.0]}
+    data = data if isinstance(data, dict) else {}
+    for question in questions:
+        name = question["name"][:255]
+        value = data.get(question["name"])
+        if value is None or aggregates.is_empty(value):
+            continue
+        counts[(name, ANSWERED)] = [1, 0, 0.0]
+        if question["kind"] == "number" and is_number(value):
+            counts[(name, ANSWERED)] = [1, 1, float(value)]
+        if question["kind"] == "choice" and isinstance(value, (str, int, float)):
+            counts[(name, aggregates.to_text(value)[:255])] = [1, 0, 0.0]
+        elif question["kind"] == "choices" and isinstance(value, list):
+            for item in value:
+                if item is not None:
+                    counts[(name, aggregates.to_text(item)[:255])] = [1, 0, 0.0]
+    return counts
+
+
+def add_counts(total, counts, sign=1):
+    for key, (count, number_count, number_sum) in counts.items():
+        row = total[key]
+        row[0] += sign * count
+        row[1] += sign * number_count
+        row[2] += sign * number_sum
+
+
+def new_total():
+    return defaultdict(lambda: [0, 0, 0.0])
+
+
+def lock_survey(survey_id):
+    """the row lock of the survey taken by every change of its summary, until the transaction ends"""
+    models.Survey.objects.select_for_update().filter(id=survey_id).values_list("id", flat=True).first()
+
+
+def apply(survey_id, total):
+    """add the counts {(question, value): [count, number_count, number_sum]} to the summary of a survey"""
+    with transaction.atomic():
+        # waits for a rebuild of the summary, see rebuild
+        lock_survey(survey_id)
+        for (question, value), (count, number_count, number_sum) in sorted(total.items()):
+            if not (count or number_count or number_sum):
+                continue
+            rows = models.AnswerSummary.objects.filter(survey_id=survey_id, question=question, value=value)
+            changes = {
+                "count": F("count") + count,
+                "number_count": F("number_count") + number_count,
+                "number_sum": F("number_sum") + number_sum,
+            }
+            if rows.update(**changes) or count < 0:
+                # counts are never taken from a missing row, eg when its survey is being deleted
+                continue
+            try:
+                with transaction.atomic():
+                    models.AnswerSummary.objects.create(
+                        survey_id=survey_id,
+                        question=question,
+                        value=value,
+                        count=count,
+                        number_count=number_count,
+                        number_sum=number_sum,
+                    )
+            except IntegrityError:
+                # created by a concurrent save in the meantime
+                rows.update(**changes)
+
+
+def count_data(survey_id, version_id, data, old_data=None, sign=1):
+    """
+    add the answers @data of a result to the summary of its survey, @old_data is what it held before the update
+    sign=-1 removes a deleted result. Queued by the Result signals with the data of the save,
+    so saves counted later still add and take back the right answers
+    """
+    questions = get_questions(survey_id, version_id)
+    total = new_total()
+    add_counts(total, get_counts(data, questions), sign)
+    if old_data is not None:
+        add_counts(total, get_counts(old_data, questions), -1)
+    apply(survey_id, total)
+
+
+def count_results(results):
+    """add new results to the summaries of their surveys, with one update per answer"""
+    totals = defaultdict(new_total)
+    for result in results:
+        add_counts(
+            totals[result.survey_id],
+            get_counts(result.data, get_questions(result.survey_id, result.version_id)),
+        )
+    for survey_id, total in totals.items():
+        apply(survey_id, total)
+
+
+def get_summary(survey):
+    """
+    the summary of the survey in the form of aggregates.aggregate, without min and max
+    eg {"total": 10, "questions": [{"name": "region", "answered": 9, "skipped": 1, "choices": {"north": 6, "south": 3}}, ...]}
+    """
+    rows = {}
+    for row in models.AnswerSummary.objects.filter(survey=survey, count__gt=0).order_by("-count", "value"):
+        rows.setdefault(row.question, []).append(row)
+    total = rows.get(TOTAL, [None])[0]
+    total = total.count if total else 0
+    questions = []
+    for question in aggregates.get_questions(survey.json):
+        summary = aggregates.empty_summary(question)
+        summary.pop("min", None)
+        summary.pop("max", None)
+        for row in rows.get(question["name"][:255], []):
+            if row.value == ANSWERED:
+                summary["answered"] = row.count
+                if "mean" in summary and row.number_count:
+                    summary["mean"] = row.number_sum / row.number_count
+            elif "choices" in summary:
+                summary["choices"][row.value] = row.count
+        summary["skipped"] = total - summary["answered"]
+        questions.append(summary)
+    return {"total": total, "questions": questions}
+
+
+def rebuild(survey, check=False, chunk_size=None):
+    """
+    count the answers of the survey again from its results and replace its summary,
+    with check=True the summary is only compared
+    returns the rows which were wrong [(question, value, count in the summary, counted count)]
+    """
+    chunk_size = chunk_size or getattr(settings, "SURVEYJS_STREAM_CHUNK_SIZE", 2000)
+    with transaction.atomic():
+        if not check:
+            # counts applied meanwhile wait for the rebuild instead of being lost in the replace.
+            # A result saved just before whose count job is still queued is counted twice,
+            # so a rebuild is run with the job queue drained or checked again afterwards
+            lock_survey(survey.id)
+        total = new_total()
+        results = models.Result.objects.filter(survey=survey).values_list("version_id", "data")
+        for version_id, data in results.iterator(chunk_size=chunk_size):
+            add_counts(total, get_counts(data, get_questions(survey.id, version_id)))
+        saved = {
+            (row.question, row.value): row
+            for row in models.AnswerSummary.objects.filter(survey=survey)
+        }
+        wrong = []
+        for key in sorted(set(saved) | set(total)):
+            row = saved.get(key)
+            counted = total[key][0] if key in total else 0
+            if (row.count if row else 0) != counted:
+                wrong.append((key[0], key[1], row.count if row else 0, counted))
+        if not check:
+            models.AnswerSummary.objects.filter(survey=survey).delete()
+            models.AnswerSummary.objects.bulk_create(
+                [
+                    models.AnswerSummary(
+                        survey=survey,
+                        question=question,
+                        value=value,
+                        count=count,
+                        number_count=number_count,
+                        number_sum=number_sum,
+                    )
+                    for (question, value), (count, number_count, number_sum) in total.items()
+                    if count
+                ],
+                batch_size=1000,
+            )
+    return wrong
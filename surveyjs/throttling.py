@@ -0,0 +1,189 @@
+"""
+Rate limits of the public survey endpoints, per survey, client ip and user.
+
+The default rates are settings.SURVEYJS_SUBMIT_RATES and SURVEYJS_READ_RATES,
+Survey.rate_limit gives one survey a different submit rate eg for a big campaign.
+Allowed and throttled requests are counted per survey for survey_stats
+"""
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+from core.utils import helpers, throttling
+from . import models
+from . import submissions
+
+RATE_LIMIT_TIMEOUT = 60  # seconds a survey rate_limit is cached
+
+
+def get_rate_limits(survey_keys):
+    """
+    {survey key: rate_limit} of the surveys of post_ids or ids, "" when the survey has no rate
+    of its own and None when there is no such survey
+    """
+    keys = {"survey_rate_limit:%s" % survey_key: survey_key for survey_key in survey_keys}
+    cached = cache.get_many(keys)
+    missing = [survey_key for key, survey_key in keys.items() if key not in cached]
+    if missing:
+        post_ids = {str(submissions.to_uuid(key)): key for key in missing if submissions.to_uuid(key)}
+        ids = {str(key): key for key in missing if str(key).isdigit()}
+        loaded = {}
+        if post_ids:
+            loaded.update(
+                (post_ids[str(post_id)], rate_limit)
+                for post_id, rate_limit in models.Survey.objects.filter(
+                    post_id__in=list(post_ids)
+                ).values_list("post_id", "rate_limit")
+            )
+        if ids:
+            loaded.update(
+                (ids[str(survey_id)], rate_limit)
+                for survey_id, rate_limit in models.Survey.objects.filter(
+                    id__in=list(ids)
+                ).values_list("id", "rate_limit")
+            )
+        # unknown surveys are cached as False as the cache does not keep None apart from a miss
+        values = {
+            "survey_rate_limit:%s" % survey_key: loaded.get(survey_key, False) for survey_key in missing
+        }
+        cache.set_many(values, RATE_LIMIT_TIMEOUT)
+        cached.update(values)
+    return {
+        survey_key: None if cached[key] is False else cached[key] or ""
+        for key, survey_key in keys.items()
+    }
+
+
+def forget_rate_limit(post_id, survey_id=None):
+    cache.delete_many(
+        ["survey_rate_limit:%s" % key for key in [post_id, survey_id] if key is not None]
+    )
+
+
+def count_request(scope, survey_key, allowed=True):
+    """count a request to a survey for survey_stats, the counters expire after SURVEYJS_THROTTLE_COUNT_TIMEOUT"""
+    key = "throttle_count:%s:%s:%s" % (scope, survey_key, "allowed" if allowed else "throttled")
+    timeout = getattr(settings, "SURVEYJS_THROTTLE_COUNT_TIMEOUT", 86400)
+    if not cache.add(key, 1, timeout):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # evicted since the add
+            cache.set(key, 1, timeout)
+
+
+class SurveyThrottle(throttling.TokenBucketThrottle):
+    """one bucket per survey of the request, one per client ip and one per user"""
+
+    scope = None
+    # Survey.rate_limit is a submit rate
+    use_rate_limit = False
+
+    def get_rates(self):
+        return getattr(settings, "SURVEYJS_%s_RATES" % self.scope.upper(), {})
+
+    def get_survey_costs(self, request, view):
+        """Counter of {survey key: number of requests to it}"""
+        return Counter()
+
+    def get_survey_rates(self, survey_keys):
+        """{survey key: rate}, only for the keys of surveys which exist"""
+        rate = self.get_rates().get("survey")
+        limits = get_rate_limits(survey_keys) if survey_keys else {}
+        return {
+            survey_key: (self.use_rate_limit and limit) or rate
+            for survey_key, limit in limits.items()
+            if limit is not None
+        }
+
+    def get_buckets(self, request, view):
+        rates = self.get_rates()
+        self.survey_costs = self.get_survey_costs(request, view)
+        cost = sum(self.survey_costs.values()) or 1
+        buckets = []
+        # keys sent by the client which are not surveys get no bucket and are not counted
+        self.survey_rates = self.get_survey_rates(list(self.survey_costs))
+        for survey_key, rate in self.survey_rates.items():
+            rate = throttling.parse_rate(rate)
+            if rate:
+                buckets.append(
+                    throttling.Bucket(
+                        "%s:survey:%s" % (self.scope, survey_key), rate, self.survey_costs[survey_key]
+                    )
+                )
+        rate = throttling.parse_rate(rates.get("ip"))
+        if rate:
+            buckets.append(
+                throttling.Bucket("%s:ip:%s" % (self.scope, helpers.get_client_ip(request)), rate, cost)
+            )
+        rate = throttling.parse_rate(rates.get("user"))
+        if rate and request.user.is_authenticated:
+            buckets.append(throttling.Bucket("%s:user:%s" % (self.scope, request.user.id), rate, cost))
+        return buckets
+
+    def on_request(self, request, view, allowed=True):
+        for survey_key in self.survey_rates:
+            count_request(self.scope, survey_key, allowed)
+
+
+class SurveySubmitThrottle(SurveyThrottle):
+    """
+    limits the endpoints posting results, a single one {"postId": ...}
+    or a batch [{"postId": ...}, ...] where every result takes a token
+    """
+
+    scope = "submit"
+    use_rate_limit = True
+
+    def get_survey_costs(self, request, view):
+        data = request.data
+        if isinstance(data, dict) and isinstance(data.get("results"), list):
+            data = data["results"]
+        items = data if isinstance(data, list) else [data]
+        return Counter(
+            str(post_id)
+            for post_id in (
+                submissions.to_uuid(item.get("postId")) for item in items if isinstance(item, dict)
+            )
+            if post_id
+        )
+
+
+class SurveyReadThrottle(SurveyThrottle):
+    """limits the endpoints reading one survey by ?surveyId= or ?postId="""
+
+    scope = "read"
+
+    def get_survey_costs(self, request, view):
+        survey_key = request.GET.get("surveyId") or request.GET.get("postId")
+        return Counter([survey_key] if survey_key else [])
+
+
+def survey_stats(survey):
+    """
+    rates, tokens left and requests counted since the counters were last evicted eg
+    {"submit": {"rate": "600/min", "tokens": 598.5, "allowed": 2, "throttled": 0}, "read": {...}}
+    """
+    stats = {}
+    for throttle, survey_key in [
+        (SurveySubmitThrottle(), str(survey.post_id)),
+        (SurveyReadThrottle(), str(survey.id)),
+    ]:
+        rate = throttle.get_survey_rates([survey_key]).get(survey_key)
+        parsed = throttling.parse_rate(rate)
+        counts = cache.get_many(
+            [
+                "throttle_count:%s:%s:%s" % (throttle.scope, survey_key, name)
+                for name in ["allowed", "throttled"]
+            ]
+        )
+        stats[throttle.scope] = {
+            "rate": rate,
+            "tokens": (
+                throttling.peek("%s:survey:%s" % (throttle.scope, survey_key), parsed)
+                if parsed
+                else None
+            ),
+            "allowed": counts.get("throttle_count:%s:%s:allowed" % (throttle.scope, survey_key), 0),
+            "throttled": counts.get("throttle_count:%s:%s:throttled" % (throttle.scope, survey_key), 0),
+        }
+    return stats
@@ -0,0 +1,288 @@
+"""
+Validation of submitted results against the definition of their survey.
+
+The survey json is walked once into a CompiledValidator holding one check per
+question. Compiled validators are cached per survey and version (the hash of the json) so a
+submission only runs the checks and never walks the survey json again.
+Answers to questions of an earlier version of the survey are accepted, offline clients
+can still post what they filled against it.
+"""
+import json
+from django.conf import settings
+from . import models
+
+COMMENT_SUFFIX = "-Comment"
+# question types which never hold a value
+NO_VALUE_TYPES = {"html", "image", "panel", "flowpanel"}
+CHOICE_TYPES = {"radiogroup", "dropdown", "imagepicker"}
+MULTIPLE_CHOICE_TYPES = {"checkbox", "tagbox", "ranking"}
+SPECIAL_CHOICES = {
+    "hasOther": "other",
+    "showOtherItem": "other",
+    "hasNone": "none",
+    "showNoneItem": "none",
+    "showRefuseItem": "refused",
+    "showDontKnowItem": "dontknow",
+}
+# choicesMin/choicesMax ranges longer than this are only checked by the client
+MAX_CHOICES_RANGE = 10000
+
+_cache = {}
+
+
+def normalize_data(data):
+    """the stock SurveyJS service client posts the result as a json string"""
+    if isinstance(data, str):
+        try:
+            return json.loads(data)
+        except ValueError:
+            return data
+    return data
+
+
+def get_choice_values(element):
+    """
+    allowed values of a choice question, None if they are only known by the client
+    eg loaded from a url or copied from another question
+    """
+    if element.get("choicesByUrl") or element.get("choicesFromQuestion"):
+        return None
+    values = set()
+    for choice in element.get("choices") or []:
+        value = choice.get("value") if isinstance(choice, dict) else choice
+        values.add(str(value))
+    # numbers generated by the client from choicesMin to choicesMax
+    minimum, maximum = element.get("choicesMin"), element.get("choicesMax")
+    if is_number(minimum) and is_number(maximum) and maximum > minimum:
+        step = element.get("choicesStep") if is_number(element.get("choicesStep")) else 1
+        if step <= 0 or (maximum - minimum) / step > MAX_CHOICES_RANGE:
+            return None
+        value = minimum
+        while value <= maximum:
+            values.add(str(value))
+            value += step
+    for option, value in SPECIAL_CHOICES.items():
+        if element.get(option):
+            values.add(value)
+    return values
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def stores_other_inline(element, store_others_as_comment=True):
+    """
+    the text typed in the "other" item is saved as the value of the question itself
+    when storeOthersAsComment is off, on the question or else on the survey
+    """
+    if not (element.get("hasOther") or element.get("showOtherItem")):
+        return False
+    own = element.get("storeOthersAsComment", "default")
+    if isinstance(own, bool):
+        return not own
+    return not store_others_as_comment
+
+
+def compile_question(element, max_text_length=None, store_others_as_comment=True):
+    """returns a function checking an answer of the question, it returns an error message or None"""
+    question_type = element.get("type", "text")
+    max_length = element.get("maxLength") or max_text_length
+    # any text can be the answer of a question keeping its "other" text inline
+    other_inline = stores_other_inline(element, store_others_as_comment)
+
+    if question_type in ["text", "comment"]:
+        numeric = element.get("inputType") in ["number", "range"]
+
+        def check(value):
+            if numeric and is_number(value):
+                return None
+            if not isinstance(value, str) and not is_number(value):
+                return "Must be a text."
+            if max_length and isinstance(value, str) and len(value) > max_length:
+                return "Ensure this value has at most %s characters." % max_length
+        return check
+
+    if question_type in CHOICE_TYPES and not (question_type == "imagepicker" and element.get("multiSelect")):
+        choices = None if other_inline else get_choice_values(element)
+
+        def check(value):
+            if isinstance(value, (dict, list)):
+                return "Must be a single choice."
+            if choices is not None and str(value) not in choices:
+                return '"%s" is not a valid choice.' % value
+        return check
+
+    if question_type in MULTIPLE_CHOICE_TYPES or question_type == "imagepicker":
+        choices = None if other_inline else get_choice_values(element)
+
+        def check(value):
+            if not isinstance(value, list):
+                return "Must be a list of choices."
+            if choices is not None:
+                for item in value:
+                    if isinstance(item, (dict, list)) or str(item) not in choices:
+                        return '"%s" is not a valid choice.' % item
+        return check
+
+    if question_type == "boolean":
+        allowed = [element.get("valueTrue", True), element.get("valueFalse", False)]
+
+        def check(value):
+            # True == 1 in python so the types are compared too
+            if not any(value == item and type(value) is type(item) for item in allowed):
+                return "Must be one of %s." % ", ".join(map(str, allowed))
+        return check
+
+    if question_type == "rating":
+        rate_values = element.get("rateValues")
+        choices = get_choice_values({"choices": rate_values}) if rate_values else None
+
+        def check(value):
+            if choices is not None:
+                if str(value) not in choices:
+                    return '"%s" is not a valid rating.' % value
+            elif not is_number(value):
+                return "Must be a number."
+        return check
+
+    if question_type == "matrix":
+        rows = get_choice_values({"choices": element.get("rows")}) if element.get("rows") else None
+        columns = get_choice_values({"choices": element.get("columns")}) if element.get("columns") else None
+
+        def check(value):
+            if not isinstance(value, dict):
+                return "Must be an object of row: column."
+            for row, column in value.items():
+                if rows is not None and str(row) not in rows:
+                    return '"%s" is not a valid row.' % row
+                if columns is not None and str(column) not in columns:
+                    return '"%s" is not a valid column.' % column
+        return check
+
+    if question_type == "multipletext":
+        names = {str(item.get("name")) for item in element.get("items") or [] if isinstance(item, dict)}
+
+        def check(value):
+            if not isinstance(value, dict):
+                return "Must be an object."
+            for name, text in value.items():
+                if names and name not in names:
+                    return '"%s" is not a valid item.' % name
+                if max_length and isinstance(text, str) and len(text) > max_length:
+                    return "Ensure this value has at most %s characters." % max_length
+        return check
+
+    if question_type in ["matrixdynamic", "paneldynamic", "file"]:
+        def check(value):
+            if not isinstance(value, list):
+                return "Must be a list."
+        return check
+
+    if question_type == "matrixdropdown":
+        def check(value):
+            if not isinstance(value, dict):
+                return "Must be an object."
+        return check
+
+    # custom and computed questions (expression, signaturepad...) are accepted as sent
+    return lambda value: None
+
+
+class CompiledValidator:
+    def __init__(self, survey_json, old_names=()):
+        """@old_names the questions of earlier versions of the survey, their answers are not checked"""
+        survey_json = survey_json if isinstance(survey_json, dict) else {}
+        self.checks = {}
+        self.required = set()
+        self.names = set()
+        self.old_names = set(old_names)
+        max_text_length = survey_json.get("maxTextLength")
+        store_others_as_comment = survey_json.get("storeOthersAsComment", True) is not False
+
+        def walk(elements, conditional=False):
+            for element in elements or []:
+                if not isinstance(element, dict):
+                    continue
+                # answers of hidden questions are not required
+                hidden = conditional or bool(element.get("visibleIf")) or element.get("visible") is False
+                if element.get("type") in ["panel", "flowpanel"]:
+                    walk(element.get("elements") or element.get("questions"), hidden)
+                    continue
+                if element.get("type") in NO_VALUE_TYPES or not element.get("name"):
+                    continue
+                name = str(element.get("valueName") or element["name"])
+                self.names.add(name)
+                self.checks[name] = compile_question(
+                    element,
+                    max_text_length=max_text_length,
+                    store_others_as_comment=store_others_as_comment,
+                )
+                if element.get("isRequired") and not hidden and not element.get("readOnly"):
+                    self.required.add(name)
+
+        for page in survey_json.get("pages") or [survey_json]:
+            if isinstance(page, dict):
+                walk(page.get("elements") or page.get("questions"), bool(page.get("visibleIf")))
+        for value in survey_json.get("calculatedValues") or []:
+            if isinstance(value, dict) and value.get("name"):
+                self.names.add(str(value["name"]))
+                self.checks.setdefault(str(value["name"]), lambda value: None)
+
+    def __call__(self, data):
+        """returns a dict of errors eg {"age": ["Must be a number."]}, empty if the data is valid"""
+        if not isinstance(data, dict):
+            return {"non_field_errors": ["Must be an object of question: answer."]}
+        errors = {}
+        # a survey without questions accepts anything
+        if self.names:
+            for key, value in data.items():
+                check = self.checks.get(key)
+                if check is None:
+                    if key.endswith(COMMENT_SUFFIX):
+                        key = key[: -len(COMMENT_SUFFIX)]
+                    if key in self.names or key in self.old_names:
+                        continue
+                    errors[key] = ["Unknown question."]
+                    continue
+                if value is None:
+                    continue
+                error = check(value)
+                if error:
+                    errors[key] = [error]
+        for name in self.required:
+            if data.get(name) in [None, "", [], {}]:
+                errors[name] = ["This field is required."]
+        max_size = getattr(settings, "SURVEYJS_MAX_RESULT_SIZE", None)
+        if max_size and not errors and len(json.dumps(data)) > max_size:
+            errors["non_field_errors"] = ["The result is larger than %s bytes." % max_size]
+        return errors
+
+
+def get_old_names(survey):
+    """the questions of the other published versions of the survey"""
+    names = set()
+    old_versions = models.SurveyVersion.objects.filter(surveys=survey.id).exclude(hash=survey.version_id)
+    for survey_json in old_versions.values_list("json", flat=True):
+        names |= CompiledValidator(survey_json).names
+    return names
+
+
+def get_validator(survey):
+    """the compiled validator of the survey, compiled again only when its json changes"""
+    key = survey.version_id or survey.last_updated
+    cached = _cache.get(survey.id)
+    if cached and cached[0] == key:
+        return cached[1]
+    if len(_cache) >= getattr(settings, "SURVEYJS_VALIDATOR_CACHE_SIZE", 1000):
+        _cache.clear()
+    validator = CompiledValidator(survey.json, get_old_names(survey))
+    _cache[survey.id] = (key, validator)
+    return validator
+
+
+def validate_result(survey, data):
+    """errors of a result submitted to the survey, empty if valid or validation is disabled"""
+    if not getattr(settings, "SURVEYJS_VALIDATE_RESULTS", True):
+        return {}
+    return get_validator(survey)(data)
@@ -0,0 +1,32 @@
+"""
+Content addressed versions of the survey json.
+
+Every json a survey is saved with is stored once as a SurveyVersion keyed by its hash.
+Survey.version points to the current one and every result keeps the version it was
+filled against, so old results are read with the questions they answered
+"""
+import hashlib
+import json
+from django.db import transaction
+from . import models
+
+
+def get_hash(survey_json):
+    """sha256 of the canonical json, the order of the keys does not matter"""
+    canonical = json.dumps(survey_json, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def publish(survey):
+    """store the json of the survey as a version if new and make it the current version"""
+    version_hash = get_hash(survey.json)
+    with transaction.atomic():
+        version, created = models.SurveyVersion.objects.get_or_create(
+            hash=version_hash, defaults={"json": survey.json}
+        )
+        version.surveys.add(survey)
+        if survey.version_id != version_hash:
+            # update() so last_updated and the save signals are left alone
+            models.Survey.objects.filter(pk=survey.pk).update(version=version_hash)
+            survey.version_id = version_hash
+    return version
@@ -24,12 +24,16 @@ REST_FRAMEWORK = {
         "rest_framework.renderers.BrowsableAPIRenderer",
         "rest_framework.renderers.TemplateHTMLRenderer",
     ],
+    # json and form parsers accept gzip/zstd bodies sent with a Content-Encoding header
     "DEFAULT_PARSER_CLASSES": [
-        "rest_framework.parsers.JSONParser",
-        "rest_framework.parsers.FormParser",
+        "core.utils.parsers.JSONParser",
+        "core.utils.parsers.FormParser",
         "rest_framework.parsers.MultiPartParser",
     ],
 }
+# most bytes a compressed request body may expand to
+MAX_DECOMPRESSED_REQUEST_SIZE = 50 * 1024 * 1024
+MAX_DECOMPRESSED_IMPORT_SIZE = 5 * 1024 * 1024 * 1024
 
 SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=365),
@@ -147,6 +147,26 @@ if os.getenv("IS_LOCAL"):
         }
     }
 
+# Cache, shared by every worker process: the rate limits, the throttle counters and the survey
+# snapshots live there. Redis when REDIS_URL is set, else a database table made by
+# `python manage.py createcachetable`. A local run keeps it in memory
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+elif os.getenv("IS_LOCAL"):
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "django_cache",
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -202,5 +222,45 @@ if PERMISSIONS_SCHEMA_PATH:
         except yaml.YAMLError as exc:
             print(exc)
 
+# background jobs. When enabled, side effects of new submissions (permissions, notifications)
+# are queued in the database and run by `python manage.py run_jobs` instead of inside the request
+BACKGROUND_JOBS = os.getenv("BACKGROUND_JOBS") in ["1", "true", "True"]
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_DELAY = 30  # seconds, doubled on every retry
+JOBS_TIMEOUT = 600  # seconds before a running job is considered abandoned
+JOBS_KEEP_DONE = False
+# new submissions are notified to the admins as one digest per survey every window (seconds),
+# sent by run_jobs or, without BACKGROUND_JOBS, by the next submission to the survey and
+# `python manage.py send_submission_digests` (run by cron)
+SUBMISSION_DIGEST_WINDOW = int(os.getenv("SUBMISSION_DIGEST_WINDOW", 60))
+# buffered ingestion. When set, submissions are appended to files in this directory, acknowledged
+# straight away and saved by `python manage.py flush_submission_spool`
+SUBMISSION_SPOOL_DIR = os.getenv("SUBMISSION_SPOOL_DIR")
+SUBMISSION_SPOOL_MAX_BYTES = 512 * 1024 * 1024  # submissions are refused with 503 past this backlog
+SUBMISSION_SPOOL_FSYNC = True
+# submitted results are checked against the questions of their survey
+SURVEYJS_VALIDATE_RESULTS = True
+SURVEYJS_MAX_RESULT_SIZE = 1024 * 1024  # bytes of a result once encoded as json
+SURVEYJS_DRAFT_MAX_OPERATIONS = 1000  # operations of one autosave patch
+# token bucket rate limits of the public endpoints eg "100/min", None for no limit.
+# Survey.rate_limit replaces the submit rate of the "survey" bucket for one survey
+SURVEYJS_SUBMIT_RATES = {"survey": "1200/min", "ip": "120/min", "user": "120/min"}
+SURVEYJS_READ_RATES = {"survey": "6000/min", "ip": "600/min", "user": None}
+SURVEYJS_THROTTLE_COUNT_TIMEOUT = 86400  # seconds the allowed / throttled counters of a survey are kept
+# seconds the rendered json of the survey read endpoints is cached, 0 to disable
+SURVEYJS_PAYLOAD_CACHE_TIMEOUT = 3600
+# seconds the post_id, active flag and submit permissions of a survey are cached, shared and per process
+SURVEYJS_SNAPSHOT_TIMEOUT = 300
+SURVEYJS_SNAPSHOT_LOCAL_TTL = 5
+# public surveys written as precompressed json by `python manage.py prerender_surveys`,
+# defaults to STATIC_ROOT/surveys. With PRERENDER_ON_SAVE every change is written again by the job queue
+SURVEYJS_PRERENDER_DIR = os.getenv("SURVEYJS_PRERENDER_DIR")
+SURVEYJS_PRERENDER_ON_SAVE = os.getenv("SURVEYJS_PRERENDER_ON_SAVE") in ["1", "true", "True"]
+# getSurvey serves the runtime json of a survey (without editor metadata and default values), cached per version
+SURVEYJS_RUNTIME_CACHE_TIMEOUT = 86400
+SURVEYJS_EDITOR_ONLY_KEYS = []  # more top level or nested keys only the editor reads
+SURVEYJS_STREAM_CHUNK_SIZE = 2000  # rows fetched at a time by the streamed results
+SURVEYJS_MAX_ANSWER_FILTERS = 10  # ?answer.<path>= filters of one request
+
 from .other_settings.rest_framework import *
 from .other_settings.oidc_providers import *
@@ -2,3 +2,7 @@
 from surveys.settings import *  # noqa
 
 # Override any settings required for tests here
+
+# default permissions used by the api tests
+with open(BASE_DIR / "permissions_schema.yml", "r") as stream:
+    PERMISSIONS_SCHEMA = yaml.safe_load(stream)
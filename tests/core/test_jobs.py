@@ -0,0 +1,41 @@
+import pytest
+
+from core.models import Job
+from core.utils import jobs
+
+
+pytestmark = [pytest.mark.django_db]
+
+CALLS = []
+
+
+def record(value):
+    CALLS.append(value)
+
+
+def explode():
+    raise ValueError("boom")
+
+
+def test_enqueue_runs_straight_away_without_background_jobs(settings):
+    settings.BACKGROUND_JOBS = False
+    CALLS.clear()
+    assert jobs.enqueue("tests.core.test_jobs.record", value=1) is None
+    assert CALLS == [1]
+    assert not Job.objects.exists()
+
+
+def test_run_pending(settings):
+    settings.BACKGROUND_JOBS = True
+    CALLS.clear()
+    jobs.enqueue("tests.core.test_jobs.record", value=2)
+    failing = jobs.enqueue("tests.core.test_jobs.explode", max_attempts=1)
+    assert jobs.backlog_stats()["due"] == 2
+    assert CALLS == []
+
+    assert jobs.run_pending() == (1, 1)
+    assert CALLS == [2]
+    failing.refresh_from_db()
+    assert failing.status == Job.FAILED
+    assert "boom" in failing.last_error
+    assert jobs.backlog_stats()["due"] == 0
@@ -0,0 +1,1175 @@
+import pytest
+
+from django.contrib.auth.models import User
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from guardian.shortcuts import remove_perm
+from rest_framework.test import APIClient
+
+from surveyjs import models
+
+
+pytestmark = [pytest.mark.django_db]
+
+SURVEY_JSON = {
+    "title": "Household",
+    "pages": [
+        {
+            "name": "page1",
+            "elements": [
+                {"type": "text", "name": "name", "isRequired": True, "maxLength": 20},
+                {"type": "text", "name": "age", "inputType": "number"},
+                {
+                    "type": "radiogroup",
+                    "name": "region",
+                    "choices": ["north", {"value": "south", "text": "South"}],
+                },
+            ],
+        }
+    ],
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def owner():
+    return User.objects.create(username="owner", email="owner@tempurl.com")
+
+
+@pytest.fixture
+def survey(owner):
+    return models.Survey.objects.create(user=owner, name="Household", json=SURVEY_JSON)
+
+
+@pytest.fixture
+def api(owner):
+    client = APIClient()
+    client.force_authenticate(owner)
+    return client
+
+
+def test_save_results_bulk(api, survey):
+    other = models.Survey.objects.create(name="Private", json={})
+    remove_perm("submit_survey", Group.objects.get(name="everyone"), other)
+    response = api.post(
+        "/api/v1/Survey/post/bulk",
+        {
+            "results": [
+                {"postId": str(survey.post_id), "surveyResult": {"name": "a"}},
+                {"postId": str(survey.post_id), "surveyResult": {"name": "b"}},
+                {"postId": str(other.post_id), "surveyResult": {"name": "c"}},
+                {"postId": "not-a-uuid", "surveyResult": {"name": "d"}},
+                {"postId": str(survey.post_id)},
+            ]
+        },
+        format="json",
+    )
+    assert response.status_code == 200
+    assert response.data["created"] == 2
+    assert [item["status"] for item in response.data["results"]] == [201, 201, 403, 404, 400]
+    results = models.Result.objects.filter(survey=survey).order_by("id")
+    assert [result.data["name"] for result in results] == ["a", "b"]
+    # permissions from the schema are assigned in bulk too
+    owner = survey.user
+    assert all(owner.has_perm("surveyjs.view_result", result) for result in results)
+
+
+def test_save_results(api, survey):
+    response = api.post(
+        "/api/v1/Survey/post",
+        {"postId": str(survey.post_id), "surveyResult": {"name": "a"}},
+        format="json",
+    )
+    assert response.status_code == 200
+    result = models.Result.objects.get(pk=response.data["id"])
+    assert survey.user.has_perm("surveyjs.change_result", result)
+
+
+def test_submission_digest(settings, api, survey):
+    from notifications.models import Notification
+    from core.utils import jobs
+
+    settings.BACKGROUND_JOBS = True
+    admin = User.objects.create(username="admin", is_superuser=True)
+    assert not Notification.objects.filter(recipient=admin, unread=True).exists()
+    for name in ["a", "b", "c"]:
+        api.post(
+            "/api/v1/Survey/post",
+            {"postId": str(survey.post_id), "surveyResult": {"name": name}},
+            format="json",
+        )
+    # update of an existing result is not a new submission
+    result = models.Result.objects.first()
+    result.save()
+    jobs.run_pending()
+    digest = models.SubmissionDigest.objects.get(survey=survey)
+    assert digest.count == 3 and not digest.is_sent
+
+    from surveyjs import digests
+
+    digests.send_digest(digest.id)
+    notification = Notification.objects.get(recipient=admin)
+    assert notification.description == "3 new submissions on Household"
+    assert Notification.objects.filter(recipient=admin, unread=True).count() == 1
+
+
+def test_submission_digest_without_worker(settings, api, survey):
+    from datetime import timedelta
+    from django.core.management import call_command
+    from django.utils import timezone
+    from notifications.models import Notification
+
+    settings.BACKGROUND_JOBS = False
+    settings.SUBMISSION_DIGEST_WINDOW = 60
+    admin = User.objects.create(username="admin", is_superuser=True)
+
+    def post(name):
+        api.post(
+            "/api/v1/Survey/post",
+            {"postId": str(survey.post_id), "surveyResult": {"name": name}},
+            format="json",
+        )
+
+    def end_window():
+        models.SubmissionDigest.objects.update(created=timezone.now() - timedelta(seconds=61))
+
+    post("a")
+    post("b")
+    assert not Notification.objects.filter(recipient=admin).exists()
+    # the first submission after the window sends the digest
+    end_window()
+    post("c")
+    notification = Notification.objects.get(recipient=admin)
+    assert notification.description == "2 new submissions on Household"
+    call_command("send_submission_digests")
+    assert Notification.objects.filter(recipient=admin).count() == 1
+    # the last digest is sent by the command
+    end_window()
+    call_command("send_submission_digests")
+    assert Notification.objects.filter(recipient=admin, description="1 new submission on Household").exists()
+
+
+def test_spooled_submissions(settings, tmp_path, api, survey):
+    from surveyjs import spool
+
+    settings.SUBMISSION_SPOOL_DIR = str(tmp_path)
+    response = api.post(
+        "/api/v1/Survey/post",
+        {"postId": str(survey.post_id), "surveyResult": {"name": "a"}},
+        format="json",
+    )
+    assert response.status_code == 202
+    response = api.post(
+        "/api/v1/Survey/post/bulk",
+        [{"postId": str(survey.post_id), "surveyResult": {"name": "b"}}],
+        format="json",
+    )
+    assert response.data["queued"] == 1
+    assert not models.Result.objects.exists()
+    assert spool.stats()["active_bytes"] > 0
+
+    assert spool.flush() == 2
+    assert sorted(models.Result.objects.values_list("data__name", flat=True)) == ["a", "b"]
+    assert spool.stats()["pending_bytes"] == 0
+
+    # a segment saved before a crash is not saved again
+    spool.append([spool.to_record(survey, {"name": "c"})])
+    segment = spool.seal()
+    models.SpoolSegment.objects.create(name=segment.name, count=1)
+    assert spool.flush() == 0
+    assert not segment.exists()
+
+    # the result of a user deleted before the flush is kept without its user
+    gone = User.objects.create(username="gone")
+    spool.append([spool.to_record(survey, {"name": "f"}, user=gone)])
+    gone.delete()
+    assert spool.flush() == 1
+    assert models.Result.objects.get(data__name="f").user_id is None
+
+    settings.SUBMISSION_SPOOL_MAX_BYTES = 1
+    spool.append([spool.to_record(survey, {"name": "d"})])
+    response = api.post(
+        "/api/v1/Survey/post",
+        {"postId": str(survey.post_id), "surveyResult": {"name": "e"}},
+        format="json",
+    )
+    assert response.status_code == 503
+
+
+def test_idempotent_submissions(api, survey):
+    submission_id = "0b1e8a5e-4c7e-4f3e-9a57-0a8c1a9f7c11"
+    payload = {
+        "postId": str(survey.post_id),
+        "surveyResult": {"name": "a"},
+        "submissionId": submission_id,
+    }
+    first = api.post("/api/v1/Survey/post", payload, format="json")
+    retry = api.post("/api/v1/Survey/post", payload, format="json")
+    assert first.data["id"] == retry.data["id"]
+
+    response = api.post(
+        "/api/v1/Survey/post/bulk",
+        [payload, {**payload, "submissionId": None}, {**payload, "submissionId": "bad"}],
+        format="json",
+    )
+    statuses = response.data["results"]
+    assert statuses[0]["id"] == first.data["id"] and statuses[0]["duplicate"]
+    assert statuses[1]["status"] == 201
+    assert statuses[2]["status"] == 400
+    assert models.Result.objects.count() == 2
+
+    # the submission id of someone else does not return their answers
+    other = APIClient()
+    other.force_authenticate(User.objects.create(username="other"))
+    response = other.post("/api/v1/Survey/post", payload, format="json")
+    assert response.status_code == 409 and "data" not in response.data
+    other_survey = models.Survey.objects.create(user=survey.user, json={})
+    response = api.post(
+        "/api/v1/Survey/post", {**payload, "postId": str(other_survey.post_id)}, format="json"
+    )
+    assert response.status_code == 409
+    response = other.post("/api/v1/Survey/post/bulk", [payload], format="json")
+    assert response.data["results"][0]["status"] == 409 and "id" not in response.data["results"][0]
+    assert response.data["failed"] == 1
+
+
+def test_import_results(api, survey):
+    body = "\n".join(
+        [
+            '{"name": "a"}',
+            '{"surveyResult": {"name": "b"}, "submissionId": "0b1e8a5e-4c7e-4f3e-9a57-0a8c1a9f7c11"}',
+            '{"surveyResult": {"name": "b"}, "submissionId": "0b1e8a5e-4c7e-4f3e-9a57-0a8c1a9f7c11"}',
+            "not json",
+            "",
+            '{"name": "c"}',
+        ]
+    )
+    response = api.post(
+        f"/api/v1/Survey/import?postId={survey.post_id}&batchSize=2",
+        data=body,
+        content_type="application/x-ndjson",
+    )
+    assert response.status_code == 200
+    assert response.data["created"] == 3
+    assert response.data["duplicates"] == 1
+    assert response.data["errors"][0]["line"] == 4
+    assert models.Result.objects.filter(survey=survey).count() == 3
+
+
+def test_import_results_command(tmp_path, survey):
+    from django.core.management import call_command
+
+    path = tmp_path / "results.ndjson"
+    path.write_text('{"name": "a"}\n{"name": "b"}\n')
+    call_command("import_results", str(path), survey=str(survey.post_id), batch_size=1)
+    assert models.Result.objects.filter(survey=survey).count() == 2
+
+
+def test_compressed_request_bodies(settings, api, survey):
+    import gzip
+    import json
+
+    payload = {"postId": str(survey.post_id), "surveyResult": {"name": "a" * 20}}
+    body = gzip.compress(json.dumps(payload).encode())
+    response = api.post(
+        "/api/v1/Survey/post",
+        data=body,
+        content_type="application/json",
+        HTTP_CONTENT_ENCODING="gzip",
+    )
+    assert response.status_code == 200
+    assert models.Result.objects.get(pk=response.data["id"]).data == payload["surveyResult"]
+
+    response = api.post(
+        f"/api/v1/Survey/import?postId={survey.post_id}",
+        data=gzip.compress(b'{"name": "b"}\n{"name": "c"}\n'),
+        content_type="application/x-ndjson",
+        HTTP_CONTENT_ENCODING="gzip",
+    )
+    assert response.data["created"] == 2
+
+    response = api.post(
+        "/api/v1/Survey/post", data=body, content_type="application/json", HTTP_CONTENT_ENCODING="br"
+    )
+    assert response.status_code == 415
+
+    settings.MAX_DECOMPRESSED_REQUEST_SIZE = 50
+    response = api.post(
+        "/api/v1/Survey/post", data=body, content_type="application/json", HTTP_CONTENT_ENCODING="gzip"
+    )
+    assert response.status_code == 413
+
+
+def test_zstd_request_bodies(settings, api, survey):
+    import json
+
+    zstandard = pytest.importorskip("zstandard")
+    payload = {"postId": str(survey.post_id), "surveyResult": {"name": "z"}}
+    body = zstandard.ZstdCompressor().compress(json.dumps(payload).encode())
+
+    def post(data):
+        return api.post(
+            "/api/v1/Survey/post", data=data, content_type="application/json", HTTP_CONTENT_ENCODING="zstd"
+        )
+
+    response = post(body)
+    assert response.status_code == 200
+    assert models.Result.objects.get(pk=response.data["id"]).data == {"name": "z"}
+    assert post(b"not zstd").status_code == 400
+    settings.MAX_DECOMPRESSED_REQUEST_SIZE = 20
+    assert post(body).status_code == 413
+
+
+def test_results_are_validated(api, survey):
+    from surveyjs import validators
+
+    validator = validators.get_validator(survey)
+    assert validators.get_validator(survey) is validator
+    assert validator({"name": "a", "age": 40, "region": "south", "region-Comment": "x"}) == {}
+    errors = validator({"age": "old", "region": "east", "colour": "red"})
+    assert set(errors) == {"name", "region", "colour"}
+    assert "name" in validator({"name": "a" * 21})
+
+    response = api.post(
+        "/api/v1/Survey/post",
+        {"postId": str(survey.post_id), "surveyResult": '{"region": "east"}'},
+        format="json",
+    )
+    assert response.status_code == 400
+    response = api.post(
+        "/api/v1/Survey/post",
+        {"postId": str(survey.post_id), "surveyResult": '{"name": "a"}'},
+        format="json",
+    )
+    assert models.Result.objects.get(pk=response.data["id"]).data == {"name": "a"}
+
+    # a question added by the editor is known straight away, the removed ones stay accepted
+    from guardian.shortcuts import assign_perm
+
+    assign_perm("change_survey", survey.user, survey)
+    elements = [{"type": "text", "name": "name"}, {"type": "text", "name": "phone"}]
+    api.post("/api/v1/Survey/changeJson", {"id": survey.id, "json": {"elements": elements}}, format="json")
+    response = api.post(
+        "/api/v1/Survey/post",
+        {"postId": str(survey.post_id), "surveyResult": {"name": "b", "phone": "1", "region": "north"}},
+        format="json",
+    )
+    assert response.status_code == 200
+    response = api.post(
+        "/api/v1/Survey/post",
+        {"postId": str(survey.post_id), "surveyResult": {"name": "b", "colour": "red"}},
+        format="json",
+    )
+    assert response.status_code == 400 and set(response.data["data"]) == {"colour"}
+
+    dropdown = {"type": "dropdown", "name": "d", "choicesMin": 1, "choicesMax": 5, "choicesStep": 2}
+    validator = validators.CompiledValidator({"elements": [dropdown]})
+    assert validator({"d": 3}) == {} and set(validator({"d": 2})) == {"d"}
+
+
+def test_other_text_stored_inline_is_valid():
+    from surveyjs import validators
+
+    questions = [
+        {"type": "radiogroup", "name": "r", "choices": ["a"], "showOtherItem": True},
+        {"type": "checkbox", "name": "c", "choices": ["a"], "hasOther": True},
+        {"type": "dropdown", "name": "d", "choices": ["a"]},
+    ]
+    inline = validators.CompiledValidator({"storeOthersAsComment": False, "elements": questions})
+    assert inline({"r": "my own text", "c": ["a", "my own text"]}) == {}
+    assert set(inline({"d": "my own text"})) == {"d"}
+    as_comment = validators.CompiledValidator({"elements": questions})
+    assert set(as_comment({"r": "my own text", "c": ["my own text"]})) == {"r", "c"}
+    # the question setting wins over the survey one
+    question = dict(questions[0], storeOthersAsComment=False)
+    assert validators.CompiledValidator({"elements": [question]})({"r": "my own text"}) == {}
+
+
+def test_draft_results(api, survey):
+    from core.utils import jsonpatch
+
+    document = {"a": [1, 2], "b~c": {"d": 1}}
+    jsonpatch.apply_patch(
+        document,
+        [
+            {"op": "add", "path": "/a/-", "value": 3},
+            {"op": "remove", "path": "/b~0c/d"},
+            {"op": "move", "from": "/a/0", "path": "/e"},
+            {"op": "test", "path": "/e", "value": 1},
+        ],
+    )
+    assert document == {"a": [2, 3], "b~c": {}, "e": 1}
+    with pytest.raises(jsonpatch.JsonPatchError):
+        jsonpatch.apply_patch(document, [{"op": "replace", "path": "/missing", "value": 1}])
+
+    response = api.post(
+        "/api/v1/Survey/draft",
+        {"postId": str(survey.post_id), "surveyResult": {"age": 40}},
+        format="json",
+    )
+    assert response.status_code == 201
+    draft_id, version = response.data["draftId"], response.data["version"]
+    response = api.post(
+        "/api/v1/Survey/draft/patch",
+        {
+            "draftId": draft_id,
+            "version": version,
+            "patch": [
+                {"op": "add", "path": "/name", "value": "a"},
+                {"op": "replace", "path": "/age", "value": 41},
+            ],
+        },
+        format="json",
+    )
+    assert response.data["version"] == version + 1
+    # an autosave made against an old version is refused
+    response = api.post(
+        "/api/v1/Survey/draft/patch",
+        {"draftId": draft_id, "version": version, "patch": []},
+        format="json",
+    )
+    assert response.status_code == 409
+    response = api.post(
+        "/api/v1/Survey/draft/patch",
+        {"draftId": draft_id, "patch": [{"op": "remove", "path": "/region"}]},
+        format="json",
+    )
+    assert response.status_code == 400
+    assert api.get("/api/v1/Survey/draft", {"draftId": draft_id}).data["data"] == {
+        "name": "a",
+        "age": 41,
+    }
+    assert APIClient().get("/api/v1/Survey/draft", {"draftId": draft_id}).status_code == 403
+
+    response = api.post("/api/v1/Survey/draft/complete", {"draftId": draft_id}, format="json")
+    assert response.status_code == 201
+    result = models.Result.objects.get(pk=response.data["id"])
+    assert result.data == {"name": "a", "age": 41} and str(result.submission_id) == draft_id
+    assert not models.DraftResult.objects.exists()
+    response = api.post("/api/v1/Survey/draft/complete", {"draftId": draft_id}, format="json")
+    assert response.data["id"] == result.id
+
+
+def test_submissions_are_rate_limited(settings, api, survey):
+    settings.SURVEYJS_SUBMIT_RATES = {"survey": "2/min", "ip": "10/min", "user": None}
+
+    def post():
+        return api.post(
+            "/api/v1/Survey/post",
+            {"postId": str(survey.post_id), "surveyResult": {"name": "a"}},
+            format="json",
+        )
+
+    assert post().status_code == 200
+    assert post().status_code == 200
+    response = post()
+    assert response.status_code == 429
+    assert 0 < int(response["Retry-After"]) <= 30
+    # a big campaign is given more headroom
+    survey.rate_limit = "100/min"
+    survey.save()
+    assert post().status_code == 200
+    # only staff sets the rate of a survey
+    from surveyjs.serializers import SurveySerializer
+
+    serializer = SurveySerializer(survey, data={"rate_limit": "1000000/s"}, partial=True)
+    assert serializer.is_valid() and "rate_limit" not in serializer.validated_data
+    stats = api.get("/api/v1/Survey/throttle", {"postId": str(survey.post_id)}).data
+    assert stats["submit"]["rate"] == "100/min"
+    assert (stats["submit"]["allowed"], stats["submit"]["throttled"]) == (3, 1)
+    response = api.post(
+        "/api/v1/Survey/post/bulk",
+        [{"postId": str(survey.post_id), "surveyResult": {"name": "a"}}] * 8,
+        format="json",
+    )
+    # the ip bucket has 7 tokens left
+    assert response.status_code == 429
+
+
+def test_unknown_surveys_are_not_counted(settings, api, survey):
+    from uuid import uuid4
+
+    for __ in range(5):
+        api.post("/api/v1/Survey/post", {"postId": str(uuid4()), "surveyResult": {}}, format="json")
+        api.get("/api/v1/Survey/getSurvey", {"surveyId": 10**6})
+    api.get("/api/v1/Survey/getSurvey", {"surveyId": survey.id})
+    keys = cache._cache.keys() if hasattr(cache, "_cache") else []
+    counters = [key for key in keys if "throttle_count" in key]
+    assert len(counters) == 1 and str(survey.id) in counters[0]
+    stats = api.get("/api/v1/Survey/throttle", {"postId": str(survey.post_id)}).data
+    assert stats["read"]["allowed"] == 1 and stats["read"]["rate"] == "6000/min"
+
+
+def test_conditional_get(api, survey):
+    response = api.get("/api/v1/Survey/getSurvey", {"surveyId": survey.id})
+    assert response.status_code == 200 and response.json()["id"] == survey.id
+    etag = response["ETag"]
+    response = api.get(
+        "/api/v1/Survey/getSurvey", {"surveyId": survey.id}, HTTP_IF_NONE_MATCH=etag
+    )
+    assert response.status_code == 304 and not response.content
+    response = api.get(
+        "/api/v1/Survey/getSurvey",
+        {"surveyId": survey.id},
+        HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+    )
+    assert response.status_code == 304
+    # another projection is another body
+    response = api.get(
+        "/api/v1/Survey/getSurvey",
+        {"surveyId": survey.id, "query": "{id}"},
+        HTTP_IF_NONE_MATCH=etag,
+    )
+    assert response.status_code == 200
+
+    active_etag = api.get("/api/v1/Survey/getActive")["ETag"]
+    assert api.get("/api/v1/Survey/getActive", HTTP_IF_NONE_MATCH=active_etag).status_code == 304
+    survey.name = "renamed"
+    survey.save()
+    response = api.get(
+        "/api/v1/Survey/getSurvey", {"surveyId": survey.id}, HTTP_IF_NONE_MATCH=etag
+    )
+    assert response.status_code == 200 and response.json()["name"] == "renamed"
+    assert api.get("/api/v1/Survey/getActive", HTTP_IF_NONE_MATCH=active_etag).status_code == 200
+
+    # the saves of the editor change the etag too
+    from guardian.shortcuts import assign_perm
+
+    assign_perm("change_survey", survey.user, survey)
+    for action, data in [("changeJson", {"json": {"title": "Edited"}}), ("changeName", {"name": "again"})]:
+        etag = api.get("/api/v1/Survey/getSurvey", {"surveyId": survey.id})["ETag"]
+        api.post("/api/v1/Survey/%s" % action, {"id": survey.id, **data}, format="json")
+        response = api.get("/api/v1/Survey/getSurvey", {"surveyId": survey.id}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200 and response["ETag"] != etag
+
+
+def test_survey_versions(api, survey):
+    from surveyjs import versions
+
+    survey.refresh_from_db()
+    first = survey.version_id
+    assert first == versions.get_hash(dict(reversed(list(SURVEY_JSON.items()))))
+    response = api.post(
+        "/api/v1/Survey/post",
+        {"postId": str(survey.post_id), "surveyResult": {"name": "a"}},
+        format="json",
+    )
+    assert response.data["version"] == first
+
+    survey.json = {**SURVEY_JSON, "title": "Second"}
+    survey.save()
+    assert survey.version_id != first and models.SurveyVersion.objects.count() == 2
+    # the same json is stored once
+    survey.json = SURVEY_JSON
+    survey.save()
+    assert survey.version_id == first and models.SurveyVersion.objects.count() == 2
+    assert models.Result.objects.get(pk=response.data["id"]).version.json == SURVEY_JSON
+
+    response = api.get("/api/v1/Survey/versions/%s" % first)
+    assert response.data["json"] == SURVEY_JSON
+    assert "immutable" in response["Cache-Control"]
+    response = api.get("/api/v1/Survey/versions/%s" % first, HTTP_IF_NONE_MATCH=response["ETag"])
+    assert response.status_code == 304
+    assert api.get("/api/v1/Survey/versions/%s" % ("0" * 64)).status_code == 404
+
+
+def test_survey_payload_cache(api, owner, survey):
+    from django.contrib.auth.models import Permission
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    # the detail endpoint also checks the model permission
+    owner.user_permissions.add(Permission.objects.get(codename="view_survey"))
+
+    def get(url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = api.get(url, params)
+        return response, len(queries)
+
+    for url, params in [
+        ("/api/v1/Survey/getSurvey", {"surveyId": survey.id}),
+        ("/api/v1/Survey/%s" % survey.id, None),
+        ("/api/v1/Survey/getActive", None),
+    ]:
+        first, first_queries = get(url, params)
+        cached, cached_queries = get(url, params)
+        assert first.status_code == 200 and cached.content == first.content
+        assert cached_queries < first_queries
+    # a write without a new last_updated still drops the cached body
+    models.Survey.objects.filter(pk=survey.pk).update(name="renamed")
+    survey.refresh_from_db()
+    survey.save(update_fields=["name"])
+    response = api.get("/api/v1/Survey/getSurvey", {"surveyId": survey.id})
+    assert response.json()["name"] == "renamed"
+
+
+def test_active_surveys_pages(api, owner, survey):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    for number in range(4):
+        models.Survey.objects.create(user=owner, json=SURVEY_JSON, name="survey %s" % number)
+    assert len(api.get("/api/v1/Survey/getActive").json()) == 5
+
+    with CaptureQueriesContext(connection) as queries:
+        page = api.get("/api/v1/Survey/getActive", {"listing": 1, "size": 2}).json()
+    assert [set(item) >= {"id", "name", "version"} and "json" not in item for item in page["results"]] == [True, True]
+    assert not any('"json"' in query["sql"] for query in queries.captured_queries)
+    ids = [item["id"] for item in page["results"]]
+    while page["next"]:
+        page = api.get(page["next"]).json()
+        ids += [item["id"] for item in page["results"]]
+    assert ids == sorted(models.Survey.objects.values_list("id", flat=True))
+
+
+def test_survey_snapshots(settings, api, owner, survey):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from guardian.shortcuts import assign_perm
+    from surveyjs import snapshots
+
+    snapshot = snapshots.get_snapshot(survey.post_id)
+    assert snapshot["id"] == survey.id and snapshot["is_active"]
+    assert snapshots.can_submit(snapshot, owner)
+    with CaptureQueriesContext(connection) as queries:
+        assert snapshots.get_snapshot(str(survey.post_id)) == snapshot
+        assert snapshots.can_submit(snapshot, owner)
+    assert not queries.captured_queries
+    # the fields of the survey of a snapshot are the ones of the row
+    survey.refresh_from_db()
+    with CaptureQueriesContext(connection) as queries:
+        instance = snapshots.get_survey(snapshot)
+        assert instance.last_updated == survey.last_updated and instance.is_active is True
+        assert (instance.id, instance.post_id, instance.version_id) == (
+            survey.id,
+            survey.post_id,
+            survey.version_id,
+        )
+    assert not queries.captured_queries
+
+    other = User.objects.create(username="other")
+    remove_perm("submit_survey", Group.objects.get(name="everyone"), survey)
+    snapshot = snapshots.get_snapshot(survey.post_id)
+    assert not snapshots.can_submit(snapshot, other)
+    # a new permission or group drops the snapshot of the survey and the groups of the user
+    assign_perm("submit_survey", other, survey)
+    assert snapshots.can_submit(snapshots.get_snapshot(survey.post_id), other)
+    group = Group.objects.create(name="late")
+    third = User.objects.create(username="third")
+    assert not snapshots.can_submit(snapshots.get_snapshot(survey.post_id), third)
+    assign_perm("submit_survey", group, survey)
+    third.groups.add(group)
+    assert snapshots.can_submit(snapshots.get_snapshot(survey.post_id), third)
+
+    # a warm submission saves the result with the survey of the snapshot
+    settings.BACKGROUND_JOBS = True
+
+    def post():
+        return api.post(
+            "/api/v1/Survey/post",
+            {"postId": str(survey.post_id), "surveyResult": {"name": "a"}},
+            format="json",
+        )
+
+    post()
+    with CaptureQueriesContext(connection) as queries:
+        response = post()
+    assert response.status_code == 200 and response.data["survey"] == survey.id
+    assert not [query for query in queries.captured_queries if 'FROM "surveyjs_survey"' in query["sql"]]
+    assert models.Result.objects.get(pk=response.data["id"]).version_id == survey.version_id
+
+    response = api.post(
+        "/api/v1/Survey/post",
+        {"postId": "00000000-0000-0000-0000-000000000000", "surveyResult": {"name": "a"}},
+        format="json",
+    )
+    assert response.status_code == 404
+
+
+def test_prerender_surveys(settings, tmp_path, owner, survey):
+    import gzip
+    import json
+    from django.core.management import call_command
+    from guardian.shortcuts import assign_perm, get_anonymous_user
+    from surveyjs import prerender
+
+    settings.SURVEYJS_PRERENDER_DIR = str(tmp_path)
+    # only the surveys anonymous users may view are public
+    assign_perm("view_survey", get_anonymous_user(), survey)
+    private = models.Survey.objects.create(user=owner, json=SURVEY_JSON)
+    assert prerender.prerender_all() == {"written": 1, "unchanged": 0, "removed": 0}
+    assert prerender.prerender_all()["unchanged"] == 1
+    content = (tmp_path / ("%s.json" % survey.post_id)).read_bytes()
+    assert json.loads(content)["json"] == SURVEY_JSON
+    assert gzip.decompress((tmp_path / ("%s.json.gz" % survey.post_id)).read_bytes()) == content
+    if prerender.brotli is not None:
+        assert prerender.brotli.decompress((tmp_path / ("%s.json.br" % survey.post_id)).read_bytes()) == content
+    assert not (tmp_path / ("%s.json" % private.post_id)).exists()
+
+    # incremental mode follows the changes of the surveys
+    settings.SURVEYJS_PRERENDER_ON_SAVE = True
+    survey.json = {**SURVEY_JSON, "title": "Changed"}
+    survey.save()
+    assert json.loads((tmp_path / ("%s.json" % survey.post_id)).read_bytes())["json"]["title"] == "Changed"
+    survey.is_active = False
+    survey.save()
+    assert not list(tmp_path.iterdir())
+
+    survey.is_active = True
+    survey.save()
+    call_command("prerender_surveys", "--dir", str(tmp_path / "out"))
+    assert (tmp_path / "out" / ("%s.json.gz" % survey.post_id)).exists()
+
+    # other json files of the directory (eg STATIC_ROOT) are left alone
+    (tmp_path / "staticfiles.json").write_text("{}")
+    (tmp_path / "manifest.json").write_text("{}")
+    stale = tmp_path / "00000000-0000-0000-0000-000000000000.json"
+    stale.write_text("{}")
+    assert prerender.prerender_all(tmp_path)["removed"] == 1
+    assert (tmp_path / "staticfiles.json").exists() and (tmp_path / "manifest.json").exists()
+    assert not stale.exists()
+
+
+def test_runtime_survey_json(api, owner):
+    from surveyjs import runtime
+
+    creator_json = {
+        "$schema": "creator",
+        "title": {"default": "Household"},
+        "pages": [
+            {
+                "name": "page1",
+                "description": "",
+                "elements": [
+                    {"type": "text", "name": "name", "visible": True, "isRequired": False, "inputType": "text"},
+                    {
+                        "type": "radiogroup",
+                        "name": "region",
+                        "title": {"default": "Region", "sw": "Mkoa"},
+                        "choices": [{"value": "north", "text": "north"}, {"value": 1, "text": "South"}],
+                        "defaultValue": "",
+                    },
+                ],
+            }
+        ],
+    }
+    assert runtime.minify(creator_json) == {
+        "title": "Household",
+        "pages": [
+            {
+                "name": "page1",
+                "elements": [
+                    {"type": "text", "name": "name"},
+                    {
+                        "type": "radiogroup",
+                        "name": "region",
+                        "title": {"default": "Region", "sw": "Mkoa"},
+                        "choices": ["north", {"value": 1, "text": "South"}],
+                        "defaultValue": "",
+                    },
+                ],
+            }
+        ],
+    }
+    # values set by triggers and default answers are data, they are never shortened
+    data_json = {
+        "title": {"default": "", "fr": "Nom"},
+        "triggers": [{"type": "setvalue", "expression": "{a} = 1", "setToName": "b", "setValue": ""}],
+        "elements": [
+            {
+                "type": "multipletext",
+                "name": "contacts",
+                "items": [{"name": "phone"}, {"name": "email"}],
+                "defaultValue": {"phone": "", "email": {"default": "x"}},
+                "validators": [],
+            },
+            {"type": "checkbox", "name": "crops", "correctAnswer": [], "description": ""},
+        ],
+    }
+    assert runtime.minify(data_json) == {
+        "title": {"default": "", "fr": "Nom"},
+        "triggers": [{"type": "setvalue", "expression": "{a} = 1", "setToName": "b", "setValue": ""}],
+        "elements": [
+            {
+                "type": "multipletext",
+                "name": "contacts",
+                "items": [{"name": "phone"}, {"name": "email"}],
+                "defaultValue": {"phone": "", "email": {"default": "x"}},
+            },
+            {"type": "checkbox", "name": "crops", "correctAnswer": []},
+        ],
+    }
+    survey = models.Survey.objects.create(user=owner, json=creator_json)
+    response = api.get("/api/v1/Survey/getSurvey", {"surveyId": survey.id, "locale": "all"})
+    assert response.json()["json"] == runtime.minify(creator_json)
+    response = api.get(
+        "/api/v1/Survey/getSurvey", {"surveyId": survey.id, "variant": "full", "locale": "all"}
+    )
+    assert response.json()["json"] == creator_json
+
+
+def test_survey_locales(api, owner):
+    from guardian.shortcuts import assign_perm
+
+    multilingual = {
+        "title": {"default": "Household", "fr": "Ménage", "sw": "Kaya"},
+        "elements": [
+            {
+                "type": "radiogroup",
+                "name": "region",
+                "title": {"default": "Region", "fr": "Région", "rw": "Akarere"},
+                "choices": [{"value": "north", "text": {"default": "North", "sw": "Kaskazini"}}],
+                "choicesByUrl": {"url": "https://example.com"},
+            }
+        ],
+    }
+    survey = models.Survey.objects.create(user=owner, json=multilingual)
+
+    def get(**params):
+        return api.get(
+            "/api/v1/Survey/getSurvey",
+            {"surveyId": survey.id, **params},
+            HTTP_ACCEPT_LANGUAGE="fr-CA,fr;q=0.9,en;q=0.5",
+        ).json()["json"]
+
+    french = get()
+    assert french["locale"] == "fr" and french["title"] == "Ménage"
+    assert french["elements"][0]["title"] == "Région"
+    assert french["elements"][0]["choices"][0]["text"] == "North"
+    assert french["elements"][0]["choicesByUrl"] == {"url": "https://example.com"}
+    swahili = get(locale="sw")
+    assert swahili["title"] == "Kaya" and swahili["elements"][0]["title"] == "Region"
+    assert get(locale="de")["title"] == "Household"
+    assert get(locale="all")["title"] == multilingual["title"]
+    # languages django does not know are locales too
+    assert get(locale="rw")["elements"][0]["title"] == "Akarere"
+
+    # the editor loads the full json and saves it back, whatever the language of the browser
+    assign_perm("change_survey", owner, survey)
+    full = get(variant="full")
+    assert full == multilingual
+    api.post("/api/v1/Survey/changeJson", {"id": survey.id, "json": full}, format="json")
+    survey.refresh_from_db()
+    assert survey.json["title"] == multilingual["title"]
+    assert survey.json["elements"][0]["choices"] == multilingual["elements"][0]["choices"]
+    assert get(variant="full", locale="sw")["title"] == "Kaya"
+
+
+def test_view_results_pages_and_streams(api, survey):
+    import json
+
+    api.post(
+        "/api/v1/Survey/post/bulk",
+        [{"postId": str(survey.post_id), "surveyResult": {"name": str(number)}} for number in range(5)],
+        format="json",
+    )
+    url = "/api/v1/Survey/results"
+    assert len(api.get(url, {"postId": str(survey.post_id)}).data) == 5
+
+    page = api.get(url, {"postId": str(survey.post_id), "page": 2, "size": 2}).data
+    assert page["count"] == 5 and [result["data"]["name"] for result in page["results"]] == ["2", "3"]
+    page = api.get(url, {"postId": str(survey.post_id), "size": 3}).data
+    assert len(page["results"]) == 3 and page["next"]
+
+    response = api.get(url, {"postId": str(survey.post_id), "stream": "json"})
+    assert response.streaming
+    rows = json.loads(b"".join(response.streaming_content))
+    assert [row["data"]["name"] for row in rows] == ["0", "1", "2", "3", "4"]
+    assert rows[0]["survey"] == survey.id
+    response = api.get(url, {"postId": str(survey.post_id), "stream": "ndjson"})
+    lines = b"".join(response.streaming_content).decode().splitlines()
+    assert response["Content-Type"] == "application/x-ndjson" and len(lines) == 5
+
+
+def test_aggregate_results(api, survey):
+    survey.json = {
+        "pages": [
+            {
+                "elements": SURVEY_JSON["pages"][0]["elements"]
+                + [{"type": "checkbox", "name": "crops", "choices": ["maize", "beans"]}]
+            }
+        ]
+    }
+    survey.save()
+    answers = [
+        {"name": "A", "age": 20, "region": "north", "crops": ["maize", "beans"]},
+        {"name": "B", "age": 40, "region": "north", "crops": ["maize"]},
+        {"name": "C", "region": "south", "crops": []},
+        {"name": "D", "age": ""},
+    ]
+    api.post(
+        "/api/v1/Survey/post/bulk",
+        [{"postId": str(survey.post_id), "surveyResult": data} for data in answers],
+        format="json",
+    )
+    response = api.get("/api/v1/Survey/results/aggregates", {"postId": str(survey.post_id)})
+    assert response.status_code == 200
+    assert response.data["total"] == 4
+    questions = {question["name"]: question for question in response.data["questions"]}
+    assert list(questions) == ["name", "age", "region", "crops"]
+    assert questions["name"]["answered"] == 4 and "choices" not in questions["name"]
+    assert questions["age"]["answered"] == 2 and questions["age"]["skipped"] == 2
+    assert (questions["age"]["min"], questions["age"]["max"], questions["age"]["mean"]) == (20, 40, 30)
+    assert questions["region"]["choices"] == {"north": 2, "south": 1}
+    assert questions["crops"]["choices"] == {"maize": 2, "beans": 1}
+    assert questions["crops"]["answered"] == 2
+
+
+def test_aggregate_results_postgresql(api, survey):
+    from django.db import connection
+    from surveyjs import aggregates
+
+    if connection.vendor != "postgresql":
+        pytest.skip("the json queries of the aggregates are postgres only")
+    survey.json = {
+        "elements": SURVEY_JSON["pages"][0]["elements"]
+        + [{"type": "checkbox", "name": "crops", "choices": ["maize", "beans"]}]
+    }
+    survey.save()
+    for data in [
+        {"name": "A", "age": 20, "region": "north", "crops": ["maize", "beans"]},
+        {"name": "B", "age": 40, "region": "south", "crops": ["maize"]},
+    ]:
+        models.Result.objects.create(survey=survey, data=data)
+    models.Result.objects.create(survey=models.Survey.objects.create(user=survey.user), data={"region": "x"})
+    # the filter on the survey gives the subquery its own params
+    qs = models.Result.objects.filter(survey=survey, data__has_key="name")
+    questions = aggregates.get_questions(survey.json)
+    assert aggregates.aggregate_postgresql(qs, questions) == aggregates.aggregate_pandas(qs, questions)
+    total, summaries = aggregates.aggregate_postgresql(qs, questions)
+    assert total == 2 and summaries["region"]["choices"] == {"north": 1, "south": 1}
+    assert summaries["crops"]["choices"] == {"maize": 2, "beans": 1}
+
+
+def test_results_summary(api, survey):
+    from django.core.management import call_command
+    from django.core.management.base import CommandError
+
+    api.post(
+        "/api/v1/Survey/post/bulk",
+        [
+            {"postId": str(survey.post_id), "surveyResult": {"name": "A", "age": 20, "region": "north"}},
+            {"postId": str(survey.post_id), "surveyResult": {"name": "B", "age": 40, "region": "north"}},
+        ],
+        format="json",
+    )
+    result = models.Result.objects.create(survey=survey, data={"name": "C", "region": "south"})
+    url = "/api/v1/Survey/results/summary"
+
+    def get_summary():
+        summary = api.get(url, {"postId": str(survey.post_id)}).data
+        return summary["total"], {question["name"]: question for question in summary["questions"]}
+
+    total, questions = get_summary()
+    assert total == 3 and questions["region"]["choices"] == {"north": 2, "south": 1}
+    assert questions["age"]["answered"] == 2 and questions["age"]["mean"] == 30
+
+    result.data = {"name": "C", "region": "north", "age": 60}
+    result.save()
+    total, questions = get_summary()
+    assert questions["region"]["choices"] == {"north": 3} and questions["age"]["mean"] == 40
+    models.Result.objects.filter(data__name="A").delete()
+    total, questions = get_summary()
+    assert total == 2 and questions["region"]["choices"] == {"north": 2}
+    assert questions["name"]["skipped"] == 0
+
+    # a change the signals do not see
+    models.Result.objects.filter(id=result.id).update(data={"name": "C", "region": "south"})
+    with pytest.raises(CommandError):
+        call_command("rebuild_answer_summaries", "--check")
+    call_command("rebuild_answer_summaries")
+    call_command("rebuild_answer_summaries", "--check")
+    total, questions = get_summary()
+    assert questions["region"]["choices"] == {"north": 1, "south": 1}
+
+
+def test_results_summary_jobs(settings, survey):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from core.models import Job
+    from core.utils import jobs
+    from surveyjs import summaries
+
+    settings.BACKGROUND_JOBS = True
+    result = models.Result.objects.create(survey=survey, data={"name": "A", "region": "north"})
+    # saved again before the worker counts the first save
+    result.data = {"name": "A", "region": "south"}
+    result.save()
+    result.save(update_fields=["submission_id"])
+    assert not models.AnswerSummary.objects.exists() and not models.Answer.objects.exists()
+    jobs.run_pending()
+    summary = summaries.get_summary(survey)
+    assert summary["total"] == 1 and summary["questions"][2]["choices"] == {"south": 1}
+    assert set(result.answers.values_list("text_value", flat=True)) == {"A", "south"}
+
+    models.Result.objects.bulk_create(
+        [models.Result(survey=survey, version_id=survey.version_id, data={"name": str(number)}) for number in range(20)]
+    )
+    jobs_count = Job.objects.count()
+    with CaptureQueriesContext(connection) as queries:
+        survey.delete()
+    # the results are not taken out of the summary one by one
+    assert not any(query["sql"].startswith('UPDATE "surveyjs_answersummary"') for query in queries)
+    assert len(queries) < 20
+    assert Job.objects.count() == jobs_count and not models.AnswerSummary.objects.exists()
+
+
+def test_answer_filters(api, survey, owner):
+    from django.core.management import call_command
+    from guardian.shortcuts import assign_perm
+
+    assign_perm("surveyjs.view_result", owner)
+
+    api.post(
+        "/api/v1/Survey/post/bulk",
+        [
+            {"postId": str(survey.post_id), "surveyResult": {"name": "A", "age": 20, "region": "north"}},
+            {"postId": str(survey.post_id), "surveyResult": {"name": "B", "age": 45, "region": "north"}},
+            {"postId": str(survey.post_id), "surveyResult": {"name": "C", "age": 60, "region": "south"}},
+        ],
+        format="json",
+    )
+    result = models.Result.objects.get(data__name="C")
+    assert {(answer.question, answer.text_value, answer.number_value) for answer in result.answers.all()} == {
+        ("name", "C", None),
+        ("age", "60", 60),
+        ("region", "south", None),
+    }
+
+    def names(**params):
+        response = api.get("/api/v1/Result", {"survey__id": survey.id, "page_size": 100, **params})
+        assert response.status_code == 200
+        return sorted(result["data"]["name"] for result in response.data["results"])
+
+    assert names(**{"answer.region": "north"}) == ["A", "B"]
+    assert names(**{"answer.region": "north", "answer.age__gt": 40}) == ["B"]
+    assert names(**{"answer.region__in": "north,south", "answer.age__lte": "45"}) == ["A", "B"]
+    result.data = {"name": "C", "age": 30, "region": "north"}
+    result.save()
+    assert names(**{"answer.region": "north", "answer.age__lt": 40}) == ["A", "C"]
+    results = api.get("/api/v1/Survey/results", {"postId": str(survey.post_id), "answer.age__gte": 45}).data
+    assert [result["data"]["name"] for result in results] == ["B"]
+
+    models.Answer.objects.all().delete()
+    call_command("rebuild_answer_index", survey=str(survey.post_id))
+    assert names(**{"answer.region": "south"}) == []
+    assert models.Answer.objects.filter(result=result, question="age", number_value=30).exists()
+
+    # results saved before the Answer table are indexed by the migration
+    import importlib
+    from django.apps import apps
+
+    migration = importlib.import_module("surveyjs.migrations.0012_backfill_answers")
+    count = models.Answer.objects.count()
+    models.Answer.objects.filter(result=result).delete()
+    migration.index_answers(apps, None)
+    migration.index_answers(apps, None)
+    assert models.Answer.objects.count() == count
+    assert names(**{"answer.region": "north", "answer.age__lt": 40}) == ["A", "C"]
+
+
+def test_answer_path_filters(api, survey, owner):
+    from guardian.shortcuts import assign_perm
+
+    assign_perm("surveyjs.view_result", owner)
+    survey.json = {}
+    survey.save()
+    for data in [
+        {"name": "A", "crops": ["maize", "beans"], "household": {"size": 3, "head": "yes"}},
+        {"name": "B", "crops": ["beans"], "household": {"size": 6}, "phone": "0700"},
+        {"name": "C", "household": {"size": 8, "head": "no"}},
+    ]:
+        models.Result.objects.create(survey=survey, data=data)
+
+    def names(**params):
+        response = api.get("/api/v1/Result", {"survey__id": survey.id, "page_size": 100, **params})
+        assert response.status_code == 200, response.data
+        return sorted(result["data"]["name"] for result in response.data["results"])
+
+    assert names(**{"answer.household.head": "yes"}) == ["A"]
+    assert names(**{"answer.household.size__range": "4,8"}) == ["B", "C"]
+    assert names(**{"answer.household.size__gt": 3, "answer.household.head__exists": "true"}) == ["C"]
+    assert names(**{"answer.household.head__in": "yes,no"}) == ["A", "C"]
+    assert names(**{"answer.crops__contains": "maize"}) == ["A"]
+    assert names(**{"answer.phone__exists": "false"}) == ["A", "C"]
+    assert names(**{"answer.household.size": "6"}) == ["B"]
+
+    response = api.get("/api/v1/Result", {"answer.household.size": 6})
+    assert response.status_code == 400
+    response = api.get("/api/v1/Result", {"survey__id": survey.id, "answer.a.b.c.d.e.f": 1})
+    assert response.status_code == 400
+
+
+def test_pivot_results(api, survey):
+    survey.json = {
+        "pages": [
+            {
+                "elements": SURVEY_JSON["pages"][0]["elements"]
+                + [{"type": "checkbox", "name": "crops", "choices": ["maize", "beans"]}]
+            }
+        ]
+    }
+    survey.save()
+    answers = [
+        {"name": "A", "region": "north", "crops": ["maize", "beans"]},
+        {"name": "B", "region": "north", "crops": ["maize"]},
+        {"name": "C", "region": "south", "crops": ["maize"]},
+        {"name": "D", "region": "south"},
+    ]
+    api.post(
+        "/api/v1/Survey/post/bulk",
+        [{"postId": str(survey.post_id), "surveyResult": data} for data in answers],
+        format="json",
+    )
+    url = "/api/v1/Survey/results/pivot"
+    pivot = api.get(url, {"postId": str(survey.post_id), "rows": "region", "columns": "crops"}).data
+    assert pivot["row_keys"] == [["north"], ["south"]] and pivot["column_keys"] == [["beans"], ["maize"]]
+    assert pivot["counts"] == [[1, 2], [0, 1]] and pivot["total"] == 4
+    assert pivot["percentages"] == [[25.0, 50.0], [0.0, 25.0]]
+    assert pivot["row_totals"] == [3, 1] and pivot["column_totals"] == [1, 3]
+
+    pivot = api.get(
+        url, {"postId": str(survey.post_id), "rows": "region", "columns": "crops", "normalize": "rows"}
+    ).data
+    assert pivot["percentages"][1] == [0.0, 100.0]
+    pivot = api.get(url, {"postId": str(survey.post_id), "rows": "region,name", "columns": "crops"}).data
+    assert pivot["row_keys"][0] == ["north", "A"]
+    response = api.get(url, {"postId": str(survey.post_id), "rows": "region"})
+    assert response.status_code == 400
+
+
+def test_export_results(api, survey):
+    import csv
+    import io
+
+    api.post(
+        "/api/v1/Survey/post/bulk",
+        [
+            {"postId": str(survey.post_id), "surveyResult": {"region": "north", "name": "A", "age": 20}},
+            {"postId": str(survey.post_id), "surveyResult": {"name": "B, \"jr\""}},
+            {"postId": str(survey.post_id), "surveyResult": {"name": "=HYPERLINK(\"x\")", "age": -3}},
+        ],
+        format="json",
+    )
+    url = "/api/v1/Survey/results"
+    response = api.get(url, {"postId": str(survey.post_id), "stream": "csv"})
+    assert response.streaming and "attachment" in response["Content-Disposition"]
+    rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode("utf-8-sig"))))
+    assert rows[0][-3:] == ["name", "age", "region"] and rows[0][0] == "id"
+    assert rows[1][-3:] == ["A", "20", "north"]
+    assert rows[2][-3:] == ['B, "jr"', "", ""]
+    # answers are never run as formulas by spreadsheets
+    assert rows[3][-3:] == ["'=HYPERLINK(\"x\")", "-3", ""]
+
+    openpyxl = pytest.importorskip("openpyxl")
+    response = api.get(url, {"postId": str(survey.post_id), "stream": "xlsx"})
+    sheet = openpyxl.load_workbook(io.BytesIO(b"".join(response.streaming_content))).active
+    assert [cell.value for cell in sheet[2]][-3:] == ["A", 20, "north"]
+    # xlsx cells are typed, the text is kept as it is and never run
+    cells = list(sheet[4])[-3:]
+    assert [cell.value for cell in cells] == ["=HYPERLINK(\"x\")", -3, None]
+    assert cells[0].data_type == "s"